@@ -8,6 +8,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_wtf import CSRFProtect
+from sqlalchemy import text
 from dotenv import load_dotenv
 from app.config import Config
 
@@ -58,6 +59,13 @@ def create_app():
     app.register_blueprint(main_blueprint)
     app.register_blueprint(admin_bp, url_prefix='/admin')
 
+    # CLI commands (flask ingest, flask partitions, flask batches, flask indexes)
+    from app.cli import ingest_command, partitions_command, batches_command, indexes_command
+    app.cli.add_command(ingest_command)
+    app.cli.add_command(partitions_command)
+    app.cli.add_command(batches_command)
+    app.cli.add_command(indexes_command)
+
     # Create DB tables and initialize roles/admin user
     with app.app_context():
         # Import all models to ensure they're registered with SQLAlchemy
@@ -73,6 +81,56 @@ def create_app():
         user_service.init_roles()
         user_service.init_admin_user()
 
+        # Upload batch id on the call-log tables (idempotent). Loads stamp it through the
+        # column default, which reads the ingest.batch_id setting of their transaction
+        from app.data_ingestion import BATCH_ID_DEFAULT
+        for table in ('raw_call_logs', 'updated_call_logs'):
+            try:
+                if not _column_has_default(table, 'batch_id'):
+                    db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS batch_id INTEGER"))
+                    db.session.execute(text(f"ALTER TABLE {table} ALTER COLUMN batch_id SET DEFAULT {BATCH_ID_DEFAULT}"))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠ Could not add batch_id to {table}: {e}")
+
+        # Upload catalog columns added after upload_batches was first created (idempotent)
+        for column, definition in (('uploaded_by', 'VARCHAR(80)'), ('overlapping_files', 'TEXT')):
+            try:
+                if not _column_exists('upload_batches', column):
+                    db.session.execute(text(f"ALTER TABLE upload_batches ADD COLUMN IF NOT EXISTS {column} {definition}"))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠ Could not add {column} to upload_batches: {e}")
+
+        # Per-load memory columns added after ingestion_stats was first created (idempotent)
+        for column in ('baseline_rss_mb', 'worker_peak_rss_mb'):
+            try:
+                if not _column_exists('ingestion_stats', column):
+                    db.session.execute(text(f"ALTER TABLE ingestion_stats ADD COLUMN IF NOT EXISTS {column} DOUBLE PRECISION"))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠ Could not add {column} to ingestion_stats: {e}")
+
+        # Ingestion jobs whose process died (restart, crashed worker) are marked failed and
+        # their temp uploads removed
+        try:
+            from app.services.ingestion_job_service import recover_interrupted_jobs
+            recover_interrupted_jobs()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠ Could not recover ingestion jobs: {e}")
+
+        # Monthly log_time partitions: new (empty) call-log tables are converted here,
+        # populated ones with `flask partitions migrate`
+        try:
+            from app.partitions import partition_empty_tables
+            partition_empty_tables()
+        except Exception as e:
+            print(f"⚠ Could not partition call-log tables: {e}")
+
         # Ensure optional columns exist (idempotent)
         try:
             db.session.execute(
@@ -82,6 +140,40 @@ def create_app():
         except Exception:
             db.session.rollback()
 
+        # Indexes added after the call-log tables were created (batch_id, agent lookup, row
+        # dedup key): built here only while a table is empty; populated tables need
+        # `flask indexes build` (CREATE INDEX CONCURRENTLY). Without the unique key ingestion
+        # keeps working, it just cannot skip duplicate rows.
+        try:
+            from app.indexes import ensure_indexes
+            ensure_indexes()
+        except Exception as e:
+            print(f"⚠ Could not check call-log indexes: {e}")
+
+        from app.data_ingestion import STAGING_TABLES, RAW_COPY_COLUMNS, UPDATED_COPY_COLUMNS
+        for table, columns in (('raw_call_logs', RAW_COPY_COLUMNS), ('updated_call_logs', UPDATED_COPY_COLUMNS)):
+            try:
+                if not _column_exists(STAGING_TABLES[table], 'load_id'):
+                    db.session.execute(text(
+                        f"CREATE UNLOGGED TABLE IF NOT EXISTS {STAGING_TABLES[table]} AS "
+                        f"SELECT {columns} FROM {table} WITH NO DATA"
+                    ))
+                    db.session.execute(text(
+                        f"ALTER TABLE {STAGING_TABLES[table]} "
+                        f"ADD COLUMN IF NOT EXISTS load_id BIGINT NOT NULL DEFAULT txid_current()"
+                    ))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠ Could not create staging table for {table}: {e}")
+
+        # Staged rows of parallel loads whose process died before publishing them
+        try:
+            from app.data_ingestion import sweep_staged_rows
+            sweep_staged_rows()
+        except Exception as e:
+            print(f"⚠ Could not sweep staging tables: {e}")
+
         # Normalize designations: default to configured default designation except explicit 'Team Leader'
         try:
             db.session.execute(
@@ -95,4 +187,23 @@ def create_app():
         except Exception:
             db.session.rollback()
 
-    return app
\ No newline at end of file
+    return app
+
+
+def _relation_exists(name):
+    """True if a table/index with this name exists (PostgreSQL), without locking anything"""
+    return db.session.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': name}).scalar()
+
+
+def _column_has_default(table, column):
+    return db.session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = :table AND column_name = :column AND column_default IS NOT NULL)"
+    ), {'table': table, 'column': column}).scalar()
+
+
+def _column_exists(table, column):
+    return db.session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = :table AND column_name = :column)"
+    ), {'table': table, 'column': column}).scalar()
@@ -0,0 +1,376 @@
+"""
+Command-line ingestion for the Agent Management System.
+`flask ingest` loads directories/globs of CSV exports through DataIngestionManager
+on a process pool, bypassing the HTTP upload limit and the single upload worker.
+See DOCUMENTATION.txt for usage.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import glob
+import multiprocessing
+import os
+import signal
+import time
+import click
+import pandas as pd
+from flask.cli import with_appcontext
+from app.config import Config
+from app.loader import open_csv_stream, csv_source_name, CSV_SUFFIXES
+
+
+@click.command('ingest')
+@click.argument('sources', nargs=-1, required=True)
+@click.option('--workers', '-w', type=int, default=None,
+              help='Worker processes (default INGEST_CLI_WORKERS). 1 loads strictly one file after another.')
+@click.option('--engine', type=click.Choice(['python', 'sql']), default=None,
+              help='Ingestion engine (default INGEST_ENGINE).')
+@click.option('--user', 'username', default='cli', show_default=True,
+              help='Name recorded in the activity log.')
+@click.option('--watch', is_flag=True, help='Keep polling the sources and ingest new files as they appear.')
+@click.option('--interval', type=float, default=10.0, show_default=True,
+              help='Seconds between polls in --watch mode.')
+@with_appcontext
+def ingest_command(sources, workers, engine, username, watch, interval):
+    """
+    Ingest CSV exports from SOURCES (files, directories or quoted glob patterns).
+
+    Files are started in order of their Log Time range (oldest first); with
+    --workers 1 each file is enriched only after every earlier one is loaded.
+    Identical re-uploads are skipped; in --watch mode failed files are retried every poll.
+    """
+    workers = max(1, workers or Config.INGEST_CLI_WORKERS)
+    # Byte-range workers per file multiply with --workers; only a single-file pipeline splits files
+    parallel = None if workers == 1 else False
+    if parallel is False and Config.INGEST_PARALLEL_WORKERS > 1:
+        print(f"ℹ {workers} files at a time: each file is loaded in one process (no byte ranges)")
+    seen = set()
+    failed = []
+
+    # Spawned workers build their own app and connection pool instead of inheriting ours
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker) as pool:
+        paths = collect_files(sources)
+        if paths:
+            failed = _ingest_batch(pool, paths, engine, username, workers, parallel)
+            seen.update(paths)
+        else:
+            print("ℹ No CSV files found")
+
+        if watch:
+            print(f"👀 Watching {', '.join(sources)} (every {interval:g}s, Ctrl+C to stop)")
+            sizes = {}
+            attempts = {}  # failed path -> loads tried so far
+            try:
+                while True:
+                    time.sleep(interval)
+                    candidates = [path for path in collect_files(sources) if path not in seen]
+                    ready, sizes = _settled_files(candidates, sizes)
+                    # Files that failed earlier go again (unless they were removed meanwhile)
+                    retry = [path for path in failed if os.path.isfile(path)]
+                    for path in retry:
+                        attempts[path] = attempts.get(path, 1) + 1
+                        print(f"🔁 Retrying {os.path.basename(path)} (attempt {attempts[path]})")
+                    if ready or retry:
+                        failed = _ingest_batch(pool, ready + retry, engine, username, workers, parallel)
+                        seen.update(ready)
+                        attempts = {path: attempts.get(path, 1) for path in failed}
+            except KeyboardInterrupt:
+                print("\n🛑 Stopped watching")
+                return
+
+    if failed:
+        raise SystemExit(1)
+
+
+def collect_files(sources):
+    """Expand files, directories (non-recursive) and glob patterns to CSV/compressed CSV paths"""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            matches = [os.path.join(source, name) for name in os.listdir(source)]
+        else:
+            matches = glob.glob(source)
+        paths.extend(
+            os.path.abspath(path) for path in matches
+            if os.path.isfile(path) and path.lower().endswith(CSV_SUFFIXES)
+        )
+    return sorted(set(paths))
+
+
+def scan_date_range(file_path):
+    """(min, max) Log Time of a CSV export, read from that one column; (None, None) if unknown"""
+    try:
+        with open_csv_stream(file_path) as handle:
+            times = pd.read_csv(handle, usecols=['Log Time'], encoding='utf-8-sig')['Log Time']
+        times = pd.to_datetime(times, errors='coerce').dropna()
+        if not times.empty:
+            return times.min().to_pydatetime(), times.max().to_pydatetime()
+    except Exception as e:
+        print(f"⚠ Could not read date range of {os.path.basename(file_path)}: {e}")
+    return None, None
+
+
+def _ingest_batch(pool, paths, engine, username, workers, parallel=None):
+    """Scan, order and ingest one set of files; returns the paths that failed"""
+    print(f"📂 {len(paths)} file(s), scanning date ranges with {workers} worker(s)...")
+    ranges = dict(zip(paths, pool.map(scan_date_range, paths)))
+
+    # Chronological order; files without a readable range go last
+    ordered = sorted(paths, key=lambda path: (
+        ranges[path][0] is None, ranges[path][0] or datetime.min, ranges[path][1] or datetime.min, path
+    ))
+    for position, path in enumerate(ordered, 1):
+        start, end = ranges[path]
+        span = f"{start:%Y-%m-%d %H:%M} → {end:%Y-%m-%d %H:%M}" if start else "unknown date range"
+        print(f"   {position:>3}. {os.path.basename(path)}  {span}")
+
+    started = time.perf_counter()
+    futures = [pool.submit(_ingest_file, path, ranges[path], engine, username, parallel) for path in ordered]
+
+    rows = loaded = skipped = 0
+    failed = []
+    for future in as_completed(futures):
+        result = future.result()
+        name = result['filename']
+        if result['status'] == 'completed':
+            loaded += 1
+            rows += result['rows']
+            rate = result['rows'] / result['seconds'] if result['seconds'] else 0
+            print(f"✅ {name}: {result['rows']:,} rows in {result['seconds']:.2f}s ({rate:,.0f} rows/sec)")
+        elif result['status'] == 'skipped':
+            skipped += 1
+            print(f"⚠️ {name}: skipped, {result['message']}")
+        else:
+            failed.append(result['path'])
+            print(f"❌ {name}: {result['message']}")
+
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed else 0
+    print(f"📊 {loaded} loaded, {skipped} skipped, {len(failed)} failed: "
+          f"{rows:,} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec overall)")
+    return failed
+
+
+def _settled_files(candidates, previous_sizes):
+    """Files whose size is unchanged since the last poll (i.e. no longer being written)"""
+    sizes = {}
+    for path in candidates:
+        try:
+            sizes[path] = os.path.getsize(path)
+        except OSError:
+            continue
+    ready = [path for path, size in sizes.items() if previous_sizes.get(path) == size]
+    return ready, sizes
+
+
+# -------------------- Worker Process --------------------
+def _init_worker():
+    from app.data_ingestion import worker_app
+    # Ctrl+C stops the watcher; a file already being loaded finishes (or rolls back) on its own
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_app()
+
+
+def _ingest_file(path, date_range, engine, username, parallel=None):
+    """Ingest one file inside a worker process; returns a picklable result dict"""
+    from app import db
+    from app.models import ActivityLog
+    from app.data_ingestion import DataIngestionManager, DuplicateUploadError, worker_app
+
+    filename = csv_source_name(os.path.basename(path))
+    result = {'path': path, 'filename': filename, 'rows': 0, 'seconds': 0.0, 'status': 'completed', 'message': ''}
+
+    def progress(stage, rows=None, total=None):
+        if stage == 'Completed' and rows is not None:
+            result['rows'] = rows
+
+    with worker_app().app_context():
+        started = time.perf_counter()
+        try:
+            DataIngestionManager().ingest_csv(path, filename, date_range, progress=progress, engine=engine,
+                                              parallel=parallel, uploaded_by=username)
+        except DuplicateUploadError as e:
+            result.update(status='skipped', message=str(e))
+        except Exception as e:
+            db.session.rollback()
+            result.update(status='failed', message=str(e))
+        result['seconds'] = time.perf_counter() - started
+
+        if result['status'] == 'completed':
+            try:
+                db.session.add(ActivityLog(user=username, msg=f"ingested file '{filename}' (cli)", date=datetime.utcnow()))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+        db.session.remove()
+
+    return result
+
+
+# -------------------- Partitions --------------------
+@click.group('partitions')
+def partitions_command():
+    """Monthly log_time partitions of raw_call_logs / updated_call_logs."""
+
+
+@partitions_command.command('migrate')
+@with_appcontext
+def partitions_migrate_command():
+    """
+    Partition populated call-log tables that are still plain heap tables.
+
+    Both tables are converted in one transaction that locks them while their rows
+    are copied, so run it in a maintenance window.
+    """
+    from app import db
+    from app.partitions import PARTITIONED_TABLES, is_partitioned, partition_table
+
+    raw_conn = db.engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cursor:
+            for table in PARTITIONED_TABLES:
+                if is_partitioned(cursor, table):
+                    print(f"ℹ {table} is already partitioned")
+                    continue
+                started = time.perf_counter()
+                rows = partition_table(cursor, table)
+                print(f"   {table}: {rows:,} rows in {time.perf_counter() - started:.2f}s")
+        raw_conn.commit()
+    finally:
+        raw_conn.close()
+
+
+@partitions_command.command('list')
+@with_appcontext
+def partitions_list_command():
+    """Show each table's monthly partitions with their estimated row counts."""
+    from app import db
+    from app.partitions import PARTITIONED_TABLES, is_partitioned, list_month_partitions, default_partition_name
+
+    raw_conn = db.engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cursor:
+            for table in PARTITIONED_TABLES:
+                if not is_partitioned(cursor, table):
+                    print(f"{table}: not partitioned")
+                    continue
+                print(f"{table}:")
+                names = [name for _, name in list_month_partitions(cursor, table)] + [default_partition_name(table)]
+                for name in names:
+                    cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", (name,))
+                    row = cursor.fetchone()
+                    if row is not None:
+                        estimate = f"~{row[0]:,} rows" if row[0] >= 0 else "not analyzed yet"
+                        print(f"   {name:<40} {estimate}")
+    finally:
+        raw_conn.rollback()
+        raw_conn.close()
+
+
+@partitions_command.command('detach')
+@click.option('--before', 'cutoff', required=True, type=click.DateTime(formats=['%Y-%m']),
+              help='YYYY-MM: every month before this one is removed.')
+@click.option('--keep', is_flag=True, help='Keep detached months as <partition>_detached tables instead of dropping them.')
+@click.confirmation_option(prompt='Remove all call logs of the detached months?')
+@with_appcontext
+def partitions_detach_command(cutoff, keep):
+    """Retention: detach (and drop) whole months of call logs instead of deleting rows."""
+    from app.partitions import detach_months_before
+
+    detached = detach_months_before(cutoff, drop=not keep)
+    for name in detached:
+        print(f"🗑 {name} {'detached' if keep else 'dropped'}")
+    print(f"📊 {len(detached)} partition(s) before {cutoff:%Y-%m} removed")
+
+
+# -------------------- Upload Batches --------------------
+@click.group('batches')
+def batches_command():
+    """Upload batches that key every call-log row to the load that wrote it."""
+
+
+@batches_command.command('backfill')
+@with_appcontext
+def batches_backfill_command():
+    """
+    Give rows loaded before upload batches existed one published batch per source file,
+    and catalog the per-date row counts of batches published before the catalog existed.
+
+    Each file is updated in its own transaction; until it is backfilled, deleting it
+    falls back to matching rows by source_file.
+    """
+    from app import db
+    from app.models import RawCallLog, UpdatedCallLog, UploadBatch
+    from app.data_ingestion import CATALOG_BATCH_DATES_SQL
+
+    def catalog(batch):
+        if batch.min_log_time is not None:
+            db.session.connection().exec_driver_sql(CATALOG_BATCH_DATES_SQL, {
+                'batch_id': batch.id, 'min_time': batch.min_log_time, 'max_time': batch.max_log_time
+            })
+
+    filenames = [
+        row[0] for row in
+        db.session.query(RawCallLog.source_file).filter(RawCallLog.batch_id.is_(None)).distinct().all()
+    ]
+    for filename in filenames:
+        started = time.perf_counter()
+        try:
+            rows, min_time, max_time = db.session.query(
+                db.func.count(RawCallLog.id), db.func.min(RawCallLog.log_time), db.func.max(RawCallLog.log_time)
+            ).filter(RawCallLog.batch_id.is_(None), RawCallLog.source_file == filename).one()
+            batch = UploadBatch(source_file=filename, status='published', rows=rows,
+                                min_log_time=min_time, max_log_time=max_time, published_at=datetime.utcnow())
+            db.session.add(batch)
+            db.session.flush()
+            for model in (RawCallLog, UpdatedCallLog):
+                db.session.query(model).filter(model.batch_id.is_(None), model.source_file == filename).update(
+                    {model.batch_id: batch.id}, synchronize_session=False
+                )
+            catalog(batch)
+            db.session.commit()
+            print(f"✅ {filename}: batch {batch.id}, {rows:,} rows in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ {filename}: {e}")
+
+    uncataloged = UploadBatch.query.filter(
+        UploadBatch.status == 'published', ~UploadBatch.dates.any()
+    ).order_by(UploadBatch.id).all()
+    for batch in uncataloged:
+        try:
+            catalog(batch)
+            db.session.commit()
+            print(f"✅ {batch.source_file}: batch {batch.id} cataloged")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ {batch.source_file}: batch {batch.id}: {e}")
+
+    if not filenames and not uncataloged:
+        print("ℹ Every row already belongs to a cataloged upload batch")
+
+
+# -------------------- Indexes --------------------
+@click.group('indexes')
+def indexes_command():
+    """Secondary indexes of raw_call_logs / updated_call_logs."""
+
+
+@indexes_command.command('build')
+@with_appcontext
+def indexes_build_command():
+    """
+    Build missing or invalid call-log indexes with CREATE INDEX CONCURRENTLY.
+
+    Uploads and readers keep running while it builds; rerun it after an interrupted
+    or failed build to drop the invalid leftover and try again.
+    """
+    from app.indexes import build_indexes
+
+    started = time.perf_counter()
+    built = build_indexes()
+    if built:
+        print(f"   {len(built)} indexes built in {time.perf_counter() - started:.2f}s")
+    else:
+        print("ℹ Nothing built")
@@ -33,6 +33,25 @@ class Config:
     # ==================== FILE UPLOAD SETTINGS ====================
     MAX_CONTENT_LENGTH = 200 * 1024 * 1024  # 200MB max file size
     UPLOAD_CHUNK_SIZE = 8192  # 8KB chunks for file uploads
+    UPLOAD_TEMP_DIR = os.getenv('UPLOAD_TEMP_DIR', 'temp_uploads')  # saved uploads waiting for / being ingested
+    UPLOAD_ORPHAN_MINUTES = int(os.getenv('UPLOAD_ORPHAN_MINUTES', 60))  # temp files without a live job are removed at startup after this age
+    
+    # ==================== INGESTION SETTINGS ====================
+    INGEST_STREAMING_THRESHOLD_MB = int(os.getenv('INGEST_STREAMING_THRESHOLD_MB', 50))  # larger files are streamed in chunks
+    INGEST_MEMORY_BUDGET_MB = int(os.getenv('INGEST_MEMORY_BUDGET_MB', 256))  # working-set budget for streamed chunks
+    INGEST_PIPELINE_ENABLED = os.getenv('INGEST_PIPELINE_ENABLED', 'true').lower() == 'true'  # overlap read/transform/COPY
+    INGEST_PIPELINE_QUEUE_SIZE = int(os.getenv('INGEST_PIPELINE_QUEUE_SIZE', 2))  # chunks buffered between stages
+    INGEST_CONCURRENT_COPY = os.getenv('INGEST_CONCURRENT_COPY', 'true').lower() == 'true'  # raw/updated COPY on two connections (2PC)
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 2))  # background ingestion job threads (different files load in parallel)
+    INGEST_CLI_WORKERS = int(os.getenv('INGEST_CLI_WORKERS', 2))  # processes used by `flask ingest`
+    INGEST_DEDUP_ROWS = os.getenv('INGEST_DEDUP_ROWS', 'true').lower() == 'true'  # skip rows whose (call_log_id, log_time, log_type) is already loaded
+    INGEST_ENGINE = os.getenv('INGEST_ENGINE', 'python').lower()  # 'python' (pandas enrichment) or 'sql' (staging table + INSERT ... SELECT)
+    INGEST_COPY_FORMAT = os.getenv('INGEST_COPY_FORMAT', 'auto').lower()  # 'auto' (binary on PostgreSQL), 'binary' or 'csv'
+    INGEST_CSV_ENGINE = os.getenv('INGEST_CSV_ENGINE', 'c').lower()  # 'c' or 'pyarrow' (multi-threaded, needs pyarrow installed)
+    INGEST_PARALLEL_WORKERS = int(os.getenv('INGEST_PARALLEL_WORKERS', os.cpu_count() or 1))  # processes per huge file (1 disables)
+    INGEST_PARALLEL_THRESHOLD_MB = int(os.getenv('INGEST_PARALLEL_THRESHOLD_MB', 200))  # larger plain CSVs are split into byte ranges
+    CALL_LOG_PARTITIONING = os.getenv('CALL_LOG_PARTITIONING', 'true').lower() == 'true'  # monthly log_time partitions for raw/updated_call_logs (PostgreSQL)
+    INGEST_TRIGGER_MODE = os.getenv('INGEST_TRIGGER_MODE', 'replica').lower()  # 'replica' (session_replication_role, no table locks), 'alter' (ALTER TABLE ... DISABLE TRIGGER, blocks readers) or 'keep'
     
     # ==================== APPLICATION PATHS ====================
     TEMPLATE_FOLDER = os.path.join(os.path.dirname(__file__), 'templates')
@@ -0,0 +1,115 @@
+"""
+PostgreSQL binary COPY encoding for the Agent Management System.
+Turns COPY-ordered frames into COPY ... WITH (FORMAT BINARY) tuples with numpy:
+timestamps travel as int64 microseconds, text as raw UTF-8, NULLs as NULLs.
+See DOCUMENTATION.txt for detailed data processing descriptions.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Signature, flags (no OIDs) and header-extension length
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + (0).to_bytes(4, 'big') + (0).to_bytes(4, 'big')
+PGCOPY_TRAILER = (-1).to_bytes(2, 'big', signed=True)
+POSTGRES_EPOCH = np.datetime64('2000-01-01T00:00:00', 'us')
+NULL_LENGTH = -1
+
+
+def encode_frame(frame):
+    """
+    Encode every row of frame as a binary COPY tuple (no header/trailer).
+    datetime64 columns become TIMESTAMP fields, everything else text; NA and
+    empty strings are sent as NULL, matching what the CSV path stores.
+    """
+    rows, column_count = frame.shape
+    if rows == 0:
+        return b''
+
+    fields = [_encode_column(frame.iloc[:, position]) for position in range(column_count)]
+    widths = [4 + np.maximum(lengths, 0) for _, lengths in fields]
+
+    # Tuple layout: int16 field count, then per field int32 length + payload
+    row_sizes = 2 + np.sum(widths, axis=0)
+    row_starts = np.zeros(rows, dtype=np.int64)
+    np.cumsum(row_sizes[:-1], out=row_starts[1:])
+
+    buffer = np.empty(int(row_sizes.sum()), dtype=np.uint8)
+    _scatter_fixed(buffer, row_starts, np.full(rows, column_count, dtype='>i2'))
+
+    offsets = row_starts + 2
+    for (payload, lengths), width in zip(fields, widths):
+        _scatter_fixed(buffer, offsets, lengths.astype('>i4'))
+        _scatter_segments(buffer, offsets + 4, payload, np.maximum(lengths, 0))
+        offsets = offsets + width
+
+    return buffer.tobytes()
+
+
+def _encode_column(column):
+    """(payload bytes of the non-NULL values in row order, per-row length with -1 for NULL)"""
+    if pd.api.types.is_datetime64_any_dtype(column.dtype):
+        values = column.to_numpy(dtype='datetime64[us]')
+        null = np.isnat(values)
+        micros = (values[~null] - POSTGRES_EPOCH).astype(np.int64)
+        return micros.astype('>i8').tobytes(), np.where(null, NULL_LENGTH, 8).astype(np.int64)
+
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return _encode_categorical(column)
+
+    values = column.to_numpy(dtype=object)
+    null = pd.isna(values)
+    if null.any():
+        values = values.copy()
+        values[null] = ''
+    present = values.tolist()
+    try:
+        text = ''.join(present)
+    except TypeError:
+        present = [str(value) for value in present]
+        text = ''.join(present)
+    payload = text.encode('utf-8')
+
+    if len(payload) == len(text):
+        # Pure ASCII: byte length == character length
+        lengths = np.fromiter(map(len, present), dtype=np.int64, count=len(present))
+    else:
+        lengths = np.fromiter(
+            (len(value.encode('utf-8')) for value in present), dtype=np.int64, count=len(present)
+        )
+
+    # Empty strings go out as NULL, like unquoted empty CSV fields
+    null |= lengths == 0
+    return payload, np.where(null, NULL_LENGTH, lengths)
+
+
+def _encode_categorical(column):
+    """Encode each category once and gather per row through the codes"""
+    payloads, category_lengths = _encode_column(pd.Series(column.cat.categories, dtype=object))
+    codes = column.cat.codes.to_numpy()
+    category_lengths = np.append(category_lengths, NULL_LENGTH)  # code -1 (NA) -> NULL
+    category_starts = np.cumsum(np.maximum(category_lengths, 0)) - np.maximum(category_lengths, 0)
+    return (payloads, category_starts[codes]), category_lengths[codes]
+
+
+def _scatter_fixed(buffer, starts, values):
+    """Write one fixed-width big-endian value per row at buffer[starts]"""
+    width = values.dtype.itemsize
+    buffer[starts[:, None] + np.arange(width)] = values.view(np.uint8).reshape(-1, width)
+
+
+def _scatter_segments(buffer, starts, payload, lengths):
+    """
+    Copy variable-length segments of payload to buffer[starts]. payload is either the
+    segments back to back in row order, or (bytes, per-row source offsets) for categoricals.
+    """
+    total = int(lengths.sum())
+    if total == 0:
+        return
+    row_offsets = np.cumsum(lengths) - lengths
+    if isinstance(payload, tuple):
+        payload, source_starts = payload
+        within = np.arange(total) - np.repeat(row_offsets, lengths)
+        data = np.frombuffer(payload, dtype=np.uint8)[np.repeat(source_starts, lengths) + within]
+        buffer[np.repeat(starts, lengths) + within] = data
+    else:
+        buffer[np.repeat(starts - row_offsets, lengths) + np.arange(total)] = np.frombuffer(payload, dtype=np.uint8)
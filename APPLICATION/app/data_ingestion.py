@@ -453,479 +453,1606 @@ Combines hierarchy, status, and AgentInfo/AgentList synchronization logic.
 See DOCUMENTATION.txt for detailed data processing descriptions.
 """
 
+import numpy as np
 import pandas as pd
 from datetime import datetime
-import io
 import csv
+import hashlib
+import io
+import multiprocessing
 import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 import re
 from sqlalchemy import text
-from app.models import TeamLeader
+from app.models import TeamLeader, UploadFingerprint, IngestionStat, UploadBatch
 from app.config import Config
-from app.utils import clean_agent_name
+from app.utils import normalize_agent_names
+from app.loader import (
+    REQUIRED_COLUMNS, open_csv_stream, is_compressed, read_csv_frame, iter_csv_frames,
+    split_byte_ranges, ranges_start_on_rows, open_csv_range, read_header, validate_columns, sample_row_bytes,
+    clean_frame, iter_raw_data, strip_values
+)
+from app.ingestion_pipeline import IngestionPipeline
+from app.ingestion_stats import IngestionStats
+from app.partitions import ensure_partitions
+from app.indexes import missing_dedup_keys
+from app.copy_binary import PGCOPY_HEADER, PGCOPY_TRAILER, encode_frame
 from app import db  # ✅ add this here (global import)
 
+# Unquoted empty fields are NULL in COPY ... FORMAT CSV, so NA cells need no special casing
+COPY_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+COPY_READ_SIZE = 1024 * 1024      # bytes psycopg2 pulls from the source per read()
+COPY_PIECE_ROWS = 20000           # rows serialized at a time when streaming a chunk
+COPY_TABLES = ('raw_call_logs', 'updated_call_logs')
+RAW_COPY_COLUMNS = (
+    "agent_name, profile_id, call_log_id, log_time, log_type, state, call_type, "
+    "original_campaign, current_campaign, ember, source_file"
+)
+UPDATED_COPY_COLUMNS = (
+    "agent_name, profile_id, call_log_id, log_time, log_type, state, call_type, "
+    "original_campaign, current_campaign, ember, designation, role, "
+    "group_name, tm_name, tl_name, source_file, status"
+)
+# Row dedup: COPY lands in UNLOGGED staging tables (rows tagged with the loading
+# transaction's txid), then INSERT ... ON CONFLICT DO NOTHING publishes them
+STAGING_TABLES = {
+    'raw_call_logs': 'raw_call_logs_staging',
+    'updated_call_logs': 'updated_call_logs_staging',
+}
+
+# Upload batches: every row a load writes gets its UploadBatch id from this column default,
+# set per transaction with set_config('ingest.batch_id', ..., true)
+BATCH_ID_SETTING = 'ingest.batch_id'
+BATCH_ID_DEFAULT = f"NULLIF(current_setting('{BATCH_ID_SETTING}', true), '')::integer"
+
+# Upload catalog: per-date row counts of one batch, read through the batch_id index
+# (the log_time bounds keep it to the batch's partitions)
+CATALOG_BATCH_DATES_SQL = """
+    INSERT INTO upload_batch_dates (batch_id, log_date, rows)
+    SELECT batch_id, log_time::date, count(*)
+    FROM raw_call_logs
+    WHERE batch_id = %(batch_id)s AND log_time BETWEEN %(min_time)s AND %(max_time)s
+    GROUP BY batch_id, log_time::date
+"""
+
+# SQL engine: file header -> staging column (everything else is staged as extra_<n> and ignored)
+SQL_STAGING_COLUMNS = {
+    'Agent name': 'agent_name', 'Profile ID': 'profile_id', 'Call Log ID': 'call_log_id',
+    'Log Time': 'log_time', 'Log Type': 'log_type', 'State': 'state', 'Call type': 'call_type',
+    'Original campaign': 'original_campaign', 'Current campaign': 'current_campaign', 'Ember': 'ember',
+}
+
+# SQL engine on PostgreSQL < 16 (no pg_input_is_valid): a malformed Log Time becomes NULL
+# instead of aborting the load, like pd.to_datetime(errors='coerce') in the python engine
+TRY_TIMESTAMP_FUNCTION = """
+    CREATE OR REPLACE FUNCTION pg_temp.ingest_try_timestamp(value TEXT) RETURNS TIMESTAMP
+    LANGUAGE plpgsql STABLE AS $$
+    BEGIN
+        RETURN NULLIF(btrim(value), '')::timestamp;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END $$
+"""
+
+# Streaming mode: chunk size is derived from INGEST_MEMORY_BUDGET_MB
+CHUNK_MEMORY_FACTOR = 12          # in-memory bytes per CSV byte (frames + COPY text)
+MIN_CHUNK_ROWS = 10000
+MAX_CHUNK_ROWS = 500000
+
+
+FINGERPRINT_READ_SIZE = 1024 * 1024  # bytes hashed per read when fingerprinting an upload
+INGEST_LOCK_NAMESPACE = 20481  # first key of pg_advisory_xact_lock(namespace, hashtext(source_file))
+STAGING_LOCK_NAMESPACE = 20484  # pg_advisory_xact_lock_shared(namespace, 0) while a parallel load has rows staged
+UTF8_BOM = b'\xef\xbb\xbf'
+# The TeamLeader record every hierarchy path uses for a name (pandas lookup, SQL engine,
+# TL preservation): the newest active one
+TEAM_LEADERS_SQL = """
+    SELECT DISTINCT ON (name) name, NULLIF(tm_name, '') AS tm_name, NULLIF(group_name, '') AS group_name
+    FROM team_leaders
+    WHERE is_active = TRUE
+    ORDER BY name, id DESC
+"""
+
+
+class DuplicateUploadError(ValueError):
+    """Raised when a file with identical content has already been ingested"""
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        uploaded = fingerprint.uploaded_at.strftime('%Y-%m-%d %H:%M') if fingerprint.uploaded_at else 'earlier'
+        super().__init__(
+            f'This file was already ingested as "{fingerprint.source_file}" ({uploaded}, '
+            f'{fingerprint.row_count or 0:,} rows); nothing was loaded.'
+        )
+
+
+class MissingDedupKeyError(ValueError):
+    """Raised when INGEST_DEDUP_ROWS is on but a call-log table has no valid dedup key index"""
+
+    def __init__(self, indexes):
+        self.indexes = indexes
+        super().__init__(
+            f"Row dedup key {', '.join(indexes)} is missing or still building, so rows already "
+            f"loaded could not be skipped; run `flask indexes build` first. Nothing was loaded."
+        )
+
+
+def _no_progress(stage, rows=None, total=None):
+    """Default progress callback for ingest_csv"""
+
+
+class EnrichedChunk:
+    """raw/updated COPY frames for one input chunk; len() is its row count"""
+    __slots__ = ('raw', 'updated')
+
+    def __init__(self, raw, updated):
+        self.raw = raw
+        self.updated = updated
+
+    def __len__(self):
+        return len(self.raw)
+
+
+class CopyStream:
+    """
+    Read-only file-like object that feeds copy_expert from an iterator of text or bytes pieces.
+    Counts the size of the pieces and the time spent producing them (encoding).
+    """
+
+    def __init__(self, pieces):
+        self._pieces = iter(pieces)
+        self._current = ''
+        self._empty = ''
+        self._offset = 0
+        self.bytes = 0
+        self.source_seconds = 0.0
+
+    def read(self, size=-1):
+        parts = []
+        remaining = size
+        while remaining != 0:
+            if self._offset >= len(self._current):
+                started = time.perf_counter()
+                self._current = next(self._pieces, None)
+                self.source_seconds += time.perf_counter() - started
+                self._offset = 0
+                if self._current is None:
+                    self._current = self._empty
+                    break
+                self._empty = self._current[:0]
+                self.bytes += len(self._current)
+            if remaining < 0:
+                end = len(self._current)
+            else:
+                end = min(self._offset + remaining, len(self._current))
+                remaining -= end - self._offset
+            parts.append(self._current[self._offset:end])
+            self._offset = end
+        return self._empty.join(parts)
+
 
 class DataIngestionManager:
     """OOP class for extreme speed CSV ingestion with hierarchy + status preservation + sync"""
 
     def __init__(self):
-        pass
+        self._two_phase_supported = None
+        self._copy_format_name = None
+        self._replica_role_supported = None
 
-    def ingest_csv(self, file_path, source_filename, date_range=None):
+    def ingest_csv(self, file_path, source_filename, date_range=None, streaming=None, progress=None,
+                   content_hash=None, engine=None, parallel=None, uploaded_by=None):
         """
         EXTREME SPEED CSV ingestion (5,000+ rows/sec)
         ✅ Preserves agent status
         ✅ Handles hierarchy and TL relationships
         ✅ Syncs AgentInfo + AgentList after ingestion
+        ✅ Streams large files in memory-bounded chunks (streaming=None picks by file size)
+        ✅ Splits huge files into byte ranges loaded by worker processes (parallel=None picks by file size)
+        ✅ engine='sql' (or INGEST_ENGINE) enriches inside PostgreSQL instead of pandas
+        ✅ Reports progress(stage, rows=None, total=None) for background jobs
+        ✅ Skips identical re-uploads (DuplicateUploadError) and rows already loaded by overlapping files
+        ✅ Times every stage and stores the result as an IngestionStat row
+        ✅ Catalogs the upload (UploadBatch + per-date row counts), flagging overlapping files
+        ✅ Returns the load summary: rows, skipped, agents, min_time/max_time, overlapping_files
+        ✅ No table-level DDL: uploads of different files run side by side, readers are never blocked;
+           uploads of the same source file are serialized by an advisory lock
         """
         from app import db
 
+        progress = progress or _no_progress
+
+        # Without the unique key ON CONFLICT DO NOTHING skips nothing: refuse rather than
+        # publish every overlapping row a second time
+        if Config.INGEST_DEDUP_ROWS:
+            missing = missing_dedup_keys()
+            if missing:
+                raise MissingDedupKeyError(missing)
+
+        # Identical content short-circuits before anything is read into pandas
+        if content_hash is None:
+            progress("Fingerprinting file")
+            content_hash = self.fingerprint_file(file_path)
+
+        # A second upload of the same file waits here, then finds the first one's fingerprint
+        with self._source_file_lock(source_filename):
+            duplicate = self.find_duplicate_upload(content_hash)
+            if duplicate is not None:
+                raise DuplicateUploadError(duplicate)
+
+            stats = IngestionStats().track_memory()
+            mode = None
+            batch_id = None
+            try:
+                batch_id = self._create_batch(source_filename, uploaded_by)
+                start_time = datetime.now()
+
+                if streaming is None:
+                    streaming = self._should_stream(file_path)
+                if parallel is None:
+                    parallel = self._should_parallelize(file_path)
+                if parallel and not self._byte_ranges_start_on_rows(file_path):
+                    print("⚠ Byte ranges would cut rows (line breaks inside quoted fields?); loading in one process")
+                    parallel = False
+
+                # Resolved here, in the app context; COPY itself may run on worker threads
+                print(f"➡ COPY format: {self._copy_format()}")
+
+                # Steps 1-4: Load, enrich and COPY into raw/updated tables
+                if (engine or Config.INGEST_ENGINE) == 'sql':
+                    mode = 'sql'
+                    load = self._load_sql(file_path, source_filename, progress, stats, batch_id)
+                elif parallel:
+                    mode = 'parallel'
+                    load = self._load_parallel(file_path, source_filename, progress, stats, batch_id)
+                elif streaming:
+                    mode = 'streaming'
+                    load = self._load_streaming(file_path, source_filename, progress, stats, batch_id)
+                else:
+                    mode = 'in-memory'
+                    load = self._load_in_memory(file_path, source_filename, progress, stats, batch_id)
+
+                progress("Syncing hierarchy")
+
+                with stats.stage("Record fingerprint"):
+                    self._record_fingerprint(content_hash, source_filename, load)
+
+                # Step 5: Preserve TL info on this upload's rows
+                with stats.stage("Preserve TeamLeader info"):
+                    self._preserve_team_leader_info(batch_id, load['min_time'], load['max_time'])
+
+                # Step 6: Sync AgentInfo for the agents in this file
+                with stats.stage("Sync AgentInfo", rows=len(load['agents'])):
+                    self._update_agent_info(load['agents'])
+
+                # Step 7: Sync AgentList for the agents in this file
+                with stats.stage("Sync AgentList", rows=len(load['agents'])):
+                    self._sync_agent_list(load['agents'])
+
+                elapsed = (datetime.now() - start_time).total_seconds()
+                skipped = f", {load['skipped']:,} already loaded rows skipped" if load['skipped'] else ""
+                print(f"🚀 Ingestion completed in {elapsed:.2f} seconds ({load['rows']:,} rows{skipped})")
+                for line in stats.summary():
+                    print(line)
+                self._record_stats(source_filename, file_path, mode, stats, load)
+                progress("Completed", rows=load['rows'], total=load['rows'])
+                # Overlaps come from the loaded rows' Log Time range, recorded at publish
+                overlapping = db.session.query(UploadBatch.overlapping_files).filter(UploadBatch.id == batch_id).scalar()
+                db.session.rollback()
+                load['overlapping_files'] = overlapping.split(', ') if overlapping else []
+                return load
+
+            except Exception as e:
+                if Config.INGEST_TRIGGER_MODE == 'alter':
+                    try:
+                        raw_conn = db.engine.raw_connection()
+                        with raw_conn.cursor() as cursor:
+                            cursor.execute("ALTER TABLE raw_call_logs ENABLE TRIGGER ALL;")
+                            cursor.execute("ALTER TABLE updated_call_logs ENABLE TRIGGER ALL;")
+                        raw_conn.commit()
+                        raw_conn.close()
+                    except:
+                        pass
+
+                db.session.rollback()
+                self._fail_batch(batch_id)
+                self._record_stats(source_filename, file_path, mode, stats, error=e)
+                raise ValueError(f"Failed to ingest CSV: {str(e)}")
+            finally:
+                # The sampler thread would otherwise outlive a failed load
+                stats.stop_memory()
+
+    def _record_stats(self, source_filename, file_path, mode, stats, load=None, error=None):
+        """Store this upload's totals and stage timings as an IngestionStat row"""
+        rows = load['rows'] if load else 0
+        seconds = stats.elapsed
         try:
-            start_time = datetime.now()
-
-            # Step 1: Load CSV (optimized)
-            df = pd.read_csv(
-                file_path,
-                low_memory=False,
-                encoding="utf-8-sig",
-                dtype={
-                    'Agent name': 'string',
-                    'Profile ID': 'string',
-                    'Call Log ID': 'string',
-                    'Log Type': 'string',
-                    'State': 'string',
-                    'Call type': 'string',
-                    'Original campaign': 'string',
-                    'Current campaign': 'string',
-                    'Ember': 'string'
-                },
-                engine='c'
-            )
-            total_rows = len(df)
-
-            # Validate required columns
-            required_columns = [
-                'Agent name', 'Profile ID', 'Call Log ID', 'Log Time',
-                'Log Type', 'State', 'Call type', 'Original campaign',
-                'Current campaign', 'Ember'
-            ]
-            missing_columns = set(required_columns) - set(df.columns)
-            if missing_columns:
-                raise ValueError(f"CSV missing required columns: {missing_columns}")
-
-            # Step 2: Normalize/clean data
-            for col in required_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype('string').str.strip()
-
-            df['Log Time'] = pd.to_datetime(df['Log Time'], errors='coerce')
-            df['Cleaned Name'] = df['Agent name'].str.replace(r'-[Pp]$', '', regex=True).str.strip()
-
-            # Step 3: Fetch previous records for inheritance
-            unique_agents = df['Cleaned Name'].unique().tolist()
+            db.session.add(IngestionStat(
+                source_file=source_filename,
+                mode=mode,
+                status='failed' if error is not None else 'completed',
+                rows=rows,
+                skipped_rows=load['skipped'] if load else 0,
+                file_bytes=os.path.getsize(file_path) if os.path.exists(file_path) else None,
+                total_seconds=round(seconds, 3),
+                rows_per_sec=round(rows / seconds, 1) if seconds else None,
+                baseline_rss_mb=stats.baseline_rss_mb,
+                peak_rss_mb=stats.peak_rss_mb(),
+                worker_peak_rss_mb=stats.worker_peak_rss_mb,
+                stages=stats.as_list(),
+                error=str(error) if error is not None else None
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠ Could not record ingestion stats: {e}")
+
+    # -------------------- Load Modes --------------------
+    def _load_in_memory(self, file_path, source_filename, progress=_no_progress, stats=None, batch_id=None):
+        """Read the whole file into one frame and COPY it in two statements"""
+        stats = stats or IngestionStats()
+
+        # Step 1: Load CSV (optimized)
+        progress("Reading CSV")
+        validate_columns(read_header(file_path))
+        with stats.stage("Read CSV", nbytes=os.path.getsize(file_path)) as stage:
+            with open_csv_stream(file_path) as handle:
+                df = read_csv_frame(handle, REQUIRED_COLUMNS)
+            stage['rows'] = len(df)
+        total_rows = len(df)
+
+        # Step 2: Normalize/clean data (rows already loaded are skipped when publishing)
+        with stats.stage("Normalize", rows=total_rows):
+            df = clean_frame(df)
+            file_min_time, file_max_time = df['Log Time'].min(), df['Log Time'].max()
+
+        # Step 3: Fetch previous records for inheritance (by the names rows are stored under)
+        progress("Fetching previous records", rows=0, total=total_rows)
+        with stats.stage("Previous records") as stage:
+            file_agents, _ = self._resolve_agent_names(df['Agent name'])
+            file_agents = pd.unique(file_agents)
             file_min_date = df['Log Time'].min()
 
             previous_records = self._fetch_previous_records_with_date_context(
-                unique_agents, file_min_date, db
+                file_agents.tolist(), file_min_date, db
             )
+            hierarchy = self._build_hierarchy_lookup(file_agents, previous_records)
+            stage['rows'] = len(file_agents)
+
+        # Step 4: Bulk COPY to PostgreSQL (fast ingestion)
+        with stats.stage("Ensure partitions"):
+            ensure_partitions(file_min_time, file_max_time)
+        progress("Inserting rows", rows=0, total=total_rows)
+        copied = 0
+
+        def on_rows(rows):
+            nonlocal copied
+            copied += rows
+            progress("Inserting rows", rows=copied, total=total_rows)
+
+        concurrent = self._use_concurrent_copy()
+        with self._dual_copy_session(concurrent, batch_id) as (raw_cursor, updated_cursor):
+            print("➡ Inserting raw_call_logs...")
+            with stats.stage("Build raw frame", rows=total_rows):
+                raw_frame = self._build_raw_frame(df, source_filename)
+
+            if concurrent:
+                # Raw COPY runs on its own connection while the updated rows are built and copied
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    raw_future = executor.submit(self._timed_copy, stats, 'raw_call_logs', raw_cursor, raw_frame)
+                    print("➡ Inserting updated_call_logs (concurrently)...")
+                    with stats.stage("Build updated frame", rows=total_rows):
+                        updated_frame = self._build_updated_frame(df, source_filename, hierarchy)
+                    self._timed_copy(stats, 'updated_call_logs', updated_cursor, updated_frame, on_rows)
+                    raw_future.result()
+                print(f"✅ Raw + updated data inserted: {total_rows:,} rows each")
+            else:
+                self._timed_copy(stats, 'raw_call_logs', raw_cursor, raw_frame)
+                print(f"✅ Raw data inserted: {total_rows:,} rows")
 
-            # Step 4: Bulk COPY to PostgreSQL (fast ingestion)
-            raw_conn = db.engine.raw_connection()
-            try:
-                with raw_conn.cursor() as cursor:
-                    # Disable triggers for performance
-                    try:
-                        cursor.execute("ALTER TABLE raw_call_logs DISABLE TRIGGER ALL;")
-                        cursor.execute("ALTER TABLE updated_call_logs DISABLE TRIGGER ALL;")
-                        print("✅ Triggers disabled for maximum speed")
-                    except Exception as trigger_error:
-                        print(f"⚠ Could not disable triggers: {trigger_error}")
-
-                    # Insert into raw_call_logs
-                    print("➡ Inserting raw_call_logs...")
-                    raw_csv_data = self._create_raw_csv_data(df, source_filename)
-                    self._insert_raw_copy(cursor, raw_csv_data)
-                    print(f"✅ Raw data inserted: {len(df):,} rows")
-
-                    # Insert into updated_call_logs
-                    print("➡ Inserting updated_call_logs...")
-                    updated_csv_data = self._create_updated_csv_data(df, source_filename, previous_records)
-                    self._insert_updated_copy(cursor, updated_csv_data)
-                    print(f"✅ Updated data inserted: {len(df):,} rows")
-
-                    # Re-enable triggers
+                print("➡ Inserting updated_call_logs...")
+                with stats.stage("Build updated frame", rows=total_rows):
+                    updated_frame = self._build_updated_frame(df, source_filename, hierarchy)
+                self._timed_copy(stats, 'updated_call_logs', updated_cursor, updated_frame, on_rows)
+                print(f"✅ Updated data inserted: {total_rows:,} rows")
+
+            inserted = self._publish_staged_rows(raw_cursor, updated_cursor, concurrent, total_rows, progress, stats)
+            self._publish_batch(raw_cursor, batch_id, inserted, file_min_time, file_max_time)
+            commit_started = time.perf_counter()
+        stats.add("Commit", time.perf_counter() - commit_started)
+
+        return self._load_summary(inserted, file_agents, file_min_time, file_max_time, total_rows - inserted)
+
+    def _load_streaming(self, file_path, source_filename, progress=_no_progress, stats=None, batch_id=None):
+        """
+        Read the file in chunks sized to INGEST_MEMORY_BUDGET_MB and COPY each chunk
+        through generator-backed streams, so peak memory is bounded by the chunk size.
+        With INGEST_PIPELINE_ENABLED, reading, enrichment and COPY run as overlapping stages.
+        """
+        stats = stats or IngestionStats()
+        pipelined = Config.INGEST_PIPELINE_ENABLED
+        concurrent = self._use_concurrent_copy()
+        # Chunks alive at once: one per thread plus every queue slot
+        stage_count = 3 if concurrent else 2
+        in_flight = (stage_count + 1) + stage_count * Config.INGEST_PIPELINE_QUEUE_SIZE if pipelined else 1
+        chunk_rows = self._chunk_rows_for_budget(file_path, in_flight)
+        print(f"➡ Streaming ingestion in chunks of {chunk_rows:,} rows")
+
+        # Pass 1: agents + earliest timestamp (two columns only) for hierarchy inheritance
+        progress("Scanning file")
+        with stats.stage("Scan file", nbytes=os.path.getsize(file_path)) as stage:
+            scan = self._scan_file(file_path, chunk_rows)
+            stage['rows'] = scan['rows']
+        agents = scan['agents']
+        progress("Fetching previous records", rows=0, total=scan['rows'])
+        with stats.stage("Previous records", rows=len(agents)):
+            previous_records = self._fetch_previous_records_with_date_context(
+                agents.tolist(), scan['min_time'], db
+            )
+            hierarchy = self._build_hierarchy_lookup(agents, previous_records)
+        with stats.stage("Ensure partitions"):
+            ensure_partitions(scan['min_time'], scan['max_time'])
+
+        def enrich(chunk):
+            with stats.stage("Build frames", rows=len(chunk)):
+                return EnrichedChunk(
+                    self._build_raw_frame(chunk, source_filename),
+                    self._build_updated_frame(chunk, source_filename, hierarchy)
+                )
+
+        # Pass 2: enrich + COPY chunk by chunk inside one (possibly two-phase) transaction
+        progress("Inserting rows", rows=0, total=scan['rows'])
+        copied = 0
+
+        with self._dual_copy_session(concurrent, batch_id) as (raw_cursor, updated_cursor):
+            def copy_raw(enriched):
+                self._timed_copy(stats, 'raw_call_logs', raw_cursor, enriched.raw)
+                return enriched
+
+            def copy_updated(enriched):
+                nonlocal copied
+                self._timed_copy(stats, 'updated_call_logs', updated_cursor, enriched.updated)
+                copied += len(enriched)
+                progress("Inserting rows", rows=copied, total=scan['rows'])
+                return enriched
+
+            if concurrent:
+                # Separate connections: raw COPY of chunk N+1 overlaps updated COPY of chunk N
+                stages = [('transform', enrich), ('copy_raw', copy_raw), ('copy_updated', copy_updated)]
+            else:
+                stages = [('transform', enrich), ('copy', lambda enriched: copy_updated(copy_raw(enriched)))]
+
+            chunks = stats.timed("Read CSV", iter_raw_data(file_path, chunk_rows, REQUIRED_COLUMNS))
+            if pipelined:
+                pipeline = IngestionPipeline(chunks, stages, queue_size=Config.INGEST_PIPELINE_QUEUE_SIZE)
+                pipeline_stats = pipeline.run()
+                for stage in pipeline_stats:
+                    print(f"   📊 {stage['stage']}: {stage['rows']:,} rows, "
+                          f"{stage['rows_per_sec']:,} rows/s busy, {stage['wait_seconds']}s waiting, "
+                          f"max queue {stage['max_queue_depth']}")
+                print(f"   📊 Bottleneck stage: {pipeline.bottleneck()}")
+                total_rows = pipeline_stats[-1]['rows']
+            else:
+                total_rows = 0
+                for chunk in chunks:
+                    copy_updated(copy_raw(enrich(chunk)))
+                    total_rows += len(chunk)
+                    print(f"   ✅ {total_rows:,} rows copied")
+
+            inserted = self._publish_staged_rows(raw_cursor, updated_cursor, concurrent, total_rows, progress, stats)
+            self._publish_batch(raw_cursor, batch_id, inserted, scan['min_time'], scan['max_time'])
+            commit_started = time.perf_counter()
+        stats.add("Commit", time.perf_counter() - commit_started)
+
+        return self._load_summary(inserted, agents, scan['min_time'], scan['max_time'], scan['rows'] - inserted)
+
+    def _load_parallel(self, file_path, source_filename, progress=_no_progress, stats=None, batch_id=None):
+        """
+        Split the file into newline-aligned byte ranges, one per worker process
+        (INGEST_PARALLEL_WORKERS). Each worker scans its range, then parses, enriches and
+        COPYs it into the staging tables in its own transaction; one transaction finally
+        publishes every range, so the load appears all at once or not at all.
+        """
+        stats = stats or IngestionStats()
+        validate_columns(read_header(file_path))
+        header, ranges = split_byte_ranges(file_path, Config.INGEST_PARALLEL_WORKERS)
+        chunk_rows = self._chunk_rows_for_budget(file_path, in_flight=len(ranges))
+        print(f"➡ Parallel ingestion: {len(ranges)} byte ranges, chunks of {chunk_rows:,} rows")
+
+        # Orphans of loads whose process died between staging and publishing go first;
+        # this load's own rows are protected by its lease until they are published or discarded
+        sweep_staged_rows()
+        with self._staging_lease():
+            load_ids = []
+            # Spawned workers open their own app and connections instead of inheriting ours
+            with ProcessPoolExecutor(max_workers=len(ranges), mp_context=multiprocessing.get_context('spawn')) as pool:
+                # Pass 1: agents + Log Time range of every range, merged for hierarchy inheritance
+                progress("Scanning file")
+                with stats.stage("Scan ranges", nbytes=os.path.getsize(file_path)) as stage:
+                    scans = list(pool.map(
+                        _scan_range, *zip(*[(file_path, header, start, end, chunk_rows) for start, end in ranges])
+                    ))
+                    scan = self._merge_scans(scans)
+                    stage['rows'] = scan['rows']
+                for range_scan in scans:
+                    stats.add_worker_peak(range_scan['peak_rss_mb'])
+                agents = scan['agents']
+
+                progress("Fetching previous records", rows=0, total=scan['rows'])
+                with stats.stage("Previous records", rows=len(agents)):
+                    previous_records = self._fetch_previous_records_with_date_context(
+                        agents.tolist(), scan['min_time'], db
+                    )
+                    hierarchy = self._build_hierarchy_lookup(agents, previous_records)
+                with stats.stage("Ensure partitions"):
+                    ensure_partitions(scan['min_time'], scan['max_time'])
+
+                # Pass 2: every range is enriched and staged concurrently
+                progress("Inserting rows", rows=0, total=scan['rows'])
+                staging_started = time.perf_counter()
+                futures = [
+                    pool.submit(
+                        _copy_range, file_path, header, start, end, source_filename,
+                        hierarchy, chunk_rows, self._copy_format()
+                    )
+                    for start, end in ranges
+                ]
+                staged_rows = 0
+                errors = []
+                for future in as_completed(futures):
                     try:
-                        cursor.execute("ALTER TABLE raw_call_logs ENABLE TRIGGER ALL;")
-                        cursor.execute("ALTER TABLE updated_call_logs ENABLE TRIGGER ALL;")
-                        print("✅ Triggers re-enabled")
-                    except Exception as trigger_error:
-                        print(f"⚠ Could not re-enable triggers: {trigger_error}")
+                        load_id, rows, worker_stages, worker_peak = future.result()
+                    except Exception as e:
+                        errors.append(e)
+                        for pending in futures:
+                            pending.cancel()
+                        continue
+                    load_ids.append(load_id)
+                    staged_rows += rows
+                    # Worker stages are summed over all processes (CPU time, not wall time)
+                    stats.merge(worker_stages, prefix="Workers: ")
+                    stats.add_worker_peak(worker_peak)
+                    progress("Inserting rows", rows=staged_rows, total=scan['rows'])
+                stats.add("Stage ranges", time.perf_counter() - staging_started, staged_rows)
+
+            if errors:
+                self._discard_staged(load_ids)
+                raise errors[0]
+
+            # One transaction publishes all ranges into both tables
+            progress("Skipping duplicate rows", rows=staged_rows, total=scan['rows'])
+            try:
+                with stats.stage("Publish staged rows", rows=staged_rows):
+                    with self._copy_session(batch_id=batch_id) as cursor:
+                        raw_inserted = self._publish_staged(cursor, 'raw_call_logs', RAW_COPY_COLUMNS, load_ids)
+                        inserted = self._publish_staged(cursor, 'updated_call_logs', UPDATED_COPY_COLUMNS, load_ids)
+                        self._publish_batch(cursor, batch_id, inserted, scan['min_time'], scan['max_time'])
+            except Exception:
+                self._discard_staged(load_ids)
+                raise
+
+        if raw_inserted != inserted:
+            print(f"⚠ Dedup kept {raw_inserted:,} raw vs {inserted:,} updated rows")
+        if staged_rows - inserted:
+            print(f"🔁 {staged_rows - inserted:,} duplicate rows skipped (call_log_id, log_time, log_type already loaded)")
+        print(f"✅ {len(load_ids)} ranges published: {inserted:,} rows")
+        return self._load_summary(inserted, agents, scan['min_time'], scan['max_time'], scan['rows'] - inserted)
+
+    def _copy_byte_range(self, file_path, header, start, end, source_filename, hierarchy, chunk_rows):
+        """
+        Worker side of _load_parallel: enrich one byte range and COPY it into the staging
+        tables, committed under this transaction's txid. Returns (load_id, rows staged,
+        stage stats, this worker's peak RSS in MB).
+        """
+        stats = IngestionStats().track_memory()
+        block_bytes = chunk_rows * sample_row_bytes(file_path)
+        rows = 0
+        raw_conn = db.engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cursor:
+                with open_csv_range(file_path, header, start, end) as handle:
+                    chunks = iter_csv_frames(handle, REQUIRED_COLUMNS, chunk_rows, block_bytes)
+                    for chunk in stats.timed("Read CSV", chunks):
+                        with stats.stage("Normalize", rows=len(chunk)):
+                            chunk = clean_frame(chunk)
+                        if not len(chunk):
+                            continue
+                        with stats.stage("Build frames", rows=len(chunk)):
+                            raw_frame = self._build_raw_frame(chunk, source_filename)
+                            updated_frame = self._build_updated_frame(chunk, source_filename, hierarchy)
+                        self._timed_copy(stats, 'raw_call_logs', cursor, raw_frame,
+                                         target=STAGING_TABLES['raw_call_logs'])
+                        self._timed_copy(stats, 'updated_call_logs', cursor, updated_frame,
+                                         target=STAGING_TABLES['updated_call_logs'])
+                        rows += len(chunk)
+
+                cursor.execute("SELECT txid_current()")
+                load_id = cursor.fetchone()[0]
+            raw_conn.commit()
+        finally:
+            raw_conn.close()
+            stats.stop_memory()
+        return load_id, rows, stats.as_list(), stats.peak_rss_mb()
+
+    def _merge_scans(self, scans):
+        """Combine per-range _scan_stream results into one _scan_file-style summary"""
+        names = set().union(*(scan['names'] for scan in scans))
+        min_times = [scan['min_time'] for scan in scans if scan['min_time'] is not None]
+        max_times = [scan['max_time'] for scan in scans if scan['max_time'] is not None]
+
+        agents, _ = self._resolve_agent_names(pd.Series(sorted(names), dtype='string'))
+        return {
+            'agents': pd.unique(agents),
+            'min_time': min(min_times) if min_times else None,
+            'max_time': max(max_times) if max_times else None,
+            'rows': sum(scan['rows'] for scan in scans),
+        }
+
+    def _load_sql(self, file_path, source_filename, progress=_no_progress, stats=None, batch_id=None):
+        """
+        SQL engine: COPY the file once, untouched, into a per-load UNLOGGED staging table,
+        then build raw_call_logs and updated_call_logs with two INSERT ... SELECT statements.
+        Distinct raw names are cleaned by the shared normalizer; previous-record inheritance
+        and TeamLeader overrides run in PostgreSQL, once per distinct agent name.
+        Rows already loaded are skipped (ON CONFLICT DO NOTHING).
+        """
+        stats = stats or IngestionStats()
+        with io.TextIOWrapper(open_csv_stream(file_path), encoding="utf-8-sig", newline='') as handle:
+            header = next(csv.reader(handle), [])
+        validate_columns(header)
+
+        load_key = uuid.uuid4().hex
+        staging = f"upload_staging_{load_key}"
+        agents_table = f"upload_agents_{load_key}"
+        columns = [
+            SQL_STAGING_COLUMNS.get(name, f"extra_{position}") for position, name in enumerate(header)
+        ]
+
+        # Step 1: the file crosses the network once, as-is, into a staging table committed on
+        # its own so the partitions can be added before the long load transaction starts
+        progress("Copying file to staging")
+        raw_conn = db.engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cursor:
+                with stats.stage("COPY file to staging", nbytes=os.path.getsize(file_path)) as stage:
+                    cursor.execute(
+                        f"CREATE UNLOGGED TABLE {staging} ({', '.join(f'{c} TEXT' for c in columns)})"
+                    )
+                    with io.TextIOWrapper(open_csv_stream(file_path), encoding="utf-8-sig", newline='') as handle:
+                        cursor.copy_expert(
+                            f"COPY {staging} FROM STDIN WITH (FORMAT CSV, HEADER true)", handle, size=COPY_READ_SIZE
+                        )
+                    staged_rows = stage['rows'] = cursor.rowcount
+                print(f"✅ Staged {staged_rows:,} rows")
+
+                # Log Time is parsed where it is read; the staging table is never rewritten
+                log_ts = self._try_timestamp_sql(cursor, "s.log_time")
+                with stats.stage("Log Time range", rows=staged_rows):
+                    cursor.execute(f"ANALYZE {staging}")
+                    cursor.execute(f"SELECT min({log_ts}), max({log_ts}) FROM {staging} s")
+                    min_time, max_time = cursor.fetchone()
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+
+        try:
+            # Own short transaction: ATTACH locks the default partition only until it commits
+            with stats.stage("Ensure partitions"):
+                ensure_partitions(min_time, max_time)
+            return self._insert_staged_sql(
+                staging, agents_table, staged_rows, min_time, max_time, source_filename, progress, stats, batch_id
+            )
+        finally:
+            self._drop_tables(staging, agents_table)
+
+    def _insert_staged_sql(self, staging, agents_table, staged_rows, min_time, max_time,
+                           source_filename, progress, stats, batch_id):
+        """SQL engine, steps 2-3: resolve the hierarchy and build both tables in one transaction"""
+        conflict = "ON CONFLICT DO NOTHING" if Config.INGEST_DEDUP_ROWS else ""
+        with self._copy_session(batch_id=batch_id) as cursor:
+            log_ts = self._try_timestamp_sql(cursor, "s.log_time")
+
+            # Step 2: one hierarchy row per distinct raw name; names are cleaned by the
+            # shared normalizer so both engines store identical agent names
+            progress("Resolving hierarchy", rows=0, total=staged_rows)
+            with stats.stage("Resolve hierarchy") as stage:
+                # NULL and '' names share the key '' so the insert can hash-join on it
+                cursor.execute(f"SELECT DISTINCT COALESCE(agent_name, '') FROM {staging}")
+                raw_names = [row[0] for row in cursor.fetchall()]
+                clean_names, roles = normalize_agent_names(raw_names)
+                cursor.execute(f"""
+                    CREATE UNLOGGED TABLE {agents_table} AS
+                    WITH cleaned AS (
+                        SELECT * FROM unnest(%(raw_names)s::text[], %(clean_names)s::text[], %(roles)s::text[])
+                            AS c(raw_name, agent_name, role)
+                    ), leaders AS ({TEAM_LEADERS_SQL})
+                    SELECT c.raw_name, c.agent_name, c.role,
+                           CASE WHEN tl.name IS NOT NULL THEN 'TL'
+                                WHEN p.found THEN COALESCE(NULLIF(p.designation, ''), 'Agent')
+                                ELSE %(default_designation)s END AS designation,
+                           CASE WHEN tl.name IS NOT NULL THEN COALESCE(tl.group_name, NULLIF(p.group_name, ''), '')
+                                ELSE COALESCE(NULLIF(p.group_name, ''), '') END AS group_name,
+                           CASE WHEN tl.name IS NOT NULL THEN COALESCE(tl.tm_name, NULLIF(p.tm_name, ''), '')
+                                ELSE COALESCE(NULLIF(p.tm_name, ''), '') END AS tm_name,
+                           CASE WHEN tl.name IS NOT NULL OR p.designation = 'TL' THEN 'Self'
+                                WHEN p.designation = 'TM' THEN ''
+                                ELSE COALESCE(NULLIF(p.tl_name, ''), '') END AS tl_name,
+                           COALESCE(NULLIF(p.status, ''), 'Employee') AS status
+                    FROM cleaned c
+                    LEFT JOIN LATERAL (
+                        SELECT TRUE AS found, u.designation, u.group_name, u.tm_name, u.tl_name, u.status
+                        FROM updated_call_logs u
+                        WHERE u.agent_name = c.agent_name
+                        AND u.log_time < %(cutoff)s
+                        ORDER BY u.log_time DESC
+                        LIMIT 1
+                    ) p ON TRUE
+                    LEFT JOIN leaders tl ON tl.name = c.agent_name
+                """, {
+                    'raw_names': raw_names, 'clean_names': clean_names.tolist(), 'roles': roles.tolist(),
+                    'default_designation': Config.DEFAULT_DESIGNATION, 'cutoff': min_time
+                })
+                stage['rows'] = len(raw_names)
+
+            # Step 3: both tables from the staged rows
+            progress("Inserting rows", rows=0, total=staged_rows)
+            # Empty values are stored as NULL, exactly as the CSV-based COPY path does
+            file_columns = ", ".join(
+                log_ts if column == 'log_time' else f"NULLIF(btrim(s.{column}), '')"
+                for column in ('profile_id', 'call_log_id', 'log_time', 'log_type', 'state',
+                               'call_type', 'original_campaign', 'current_campaign', 'ember')
+            )
+            with stats.stage("Insert raw_call_logs") as stage:
+                cursor.execute(f"""
+                    INSERT INTO raw_call_logs ({RAW_COPY_COLUMNS})
+                    SELECT NULLIF(btrim(s.agent_name), ''), {file_columns}, %(source_file)s
+                    FROM {staging} s
+                    {conflict}
+                """, {'source_file': source_filename})
+                stage['rows'] = cursor.rowcount
+            print(f"✅ Raw data inserted: {stage['rows']:,} rows")
+
+            with stats.stage("Insert updated_call_logs") as stage:
+                cursor.execute(f"""
+                    INSERT INTO updated_call_logs ({UPDATED_COPY_COLUMNS})
+                    SELECT NULLIF(a.agent_name, ''), {file_columns}, a.designation, a.role,
+                           NULLIF(a.group_name, ''), NULLIF(a.tm_name, ''), NULLIF(a.tl_name, ''),
+                           %(source_file)s, a.status
+                    FROM {staging} s
+                    JOIN {agents_table} a ON a.raw_name = COALESCE(s.agent_name, '')
+                    {conflict}
+                """, {'source_file': source_filename})
+                inserted = stage['rows'] = cursor.rowcount
+            print(f"✅ Updated data inserted: {inserted:,} rows")
+            progress("Inserting rows", rows=staged_rows, total=staged_rows)
+
+            cursor.execute(f"SELECT DISTINCT agent_name FROM {agents_table} WHERE agent_name <> ''")
+            agents = [row[0] for row in cursor.fetchall()]
+            self._publish_batch(cursor, batch_id, inserted, min_time, max_time)
+
+        if staged_rows - inserted:
+            print(f"🔁 {staged_rows - inserted:,} duplicate rows skipped (call_log_id, log_time, log_type already loaded)")
+        return self._load_summary(inserted, agents, min_time, max_time, staged_rows - inserted)
+
+    def _drop_tables(self, *tables):
+        """Drop per-load work tables on a connection of their own (the load's may have failed)"""
+        raw_conn = db.engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {', '.join(tables)}")
+            raw_conn.commit()
+        except Exception as e:
+            print(f"⚠ Could not drop {', '.join(tables)}: {e}")
+        finally:
+            raw_conn.close()
+
+    def _try_timestamp_sql(self, cursor, column):
+        """SQL expression for a staged text column as TIMESTAMP; NULL when blank or malformed"""
+        cursor.execute("SHOW server_version_num")
+        if int(cursor.fetchone()[0]) >= 160000:
+            return f"CASE WHEN pg_input_is_valid(btrim({column}), 'timestamp') THEN btrim({column})::timestamp END"
+        cursor.execute(TRY_TIMESTAMP_FUNCTION)
+        return f"pg_temp.ingest_try_timestamp({column})"
+
+    # -------------------- Upload Batches --------------------
+    def _create_batch(self, source_filename, uploaded_by=None):
+        """Register this load as a 'loading' UploadBatch and return its id"""
+        batch = UploadBatch(source_file=source_filename, status='loading', uploaded_by=uploaded_by)
+        db.session.add(batch)
+        db.session.commit()
+        return batch.id
+
+    def _publish_batch(self, cursor, batch_id, rows, min_time, max_time):
+        """
+        Mark the batch published and catalog its per-date row counts inside the load
+        transaction, so the catalog commits with the rows. Published files whose Log Time
+        range overlaps this one are recorded on the batch.
+        """
+        if batch_id is None:
+            return
+        params = {
+            'batch_id': batch_id,
+            'rows': rows,
+            'min_time': None if pd.isnull(min_time) else pd.Timestamp(min_time).to_pydatetime(),
+            'max_time': None if pd.isnull(max_time) else pd.Timestamp(max_time).to_pydatetime(),
+        }
+        cursor.execute("""
+            UPDATE upload_batches b
+            SET status = 'published', rows = %(rows)s, min_log_time = %(min_time)s, max_log_time = %(max_time)s,
+                published_at = timezone('utc', now()),
+                overlapping_files = (
+                    SELECT string_agg(DISTINCT o.source_file, ', ' ORDER BY o.source_file)
+                    FROM upload_batches o
+                    WHERE o.status = 'published' AND o.source_file <> b.source_file
+                    AND o.min_log_time <= %(max_time)s AND o.max_log_time >= %(min_time)s
+                )
+            WHERE id = %(batch_id)s
+            RETURNING overlapping_files
+        """, params)
+        overlaps = cursor.fetchone()[0]
+        if overlaps:
+            print(f"⚠ Log Time range overlaps {overlaps}")
+        if params['min_time'] is not None:
+            cursor.execute(CATALOG_BATCH_DATES_SQL, params)
+
+    def _fail_batch(self, batch_id):
+        if batch_id is None:
+            return
+        try:
+            db.session.execute(
+                text("UPDATE upload_batches SET status = 'failed' WHERE id = :id"), {'id': batch_id}
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠ Could not mark upload batch {batch_id} failed: {e}")
+
+    def _load_summary(self, rows, agents, min_time, max_time, skipped=0):
+        """What a load mode hands to the post-ingestion sync steps"""
+        return {
+            'rows': rows,
+            'skipped': skipped,
+            'agents': list(agents),
+            'min_time': None if pd.isnull(min_time) else pd.Timestamp(min_time).to_pydatetime(),
+            'max_time': None if pd.isnull(max_time) else pd.Timestamp(max_time).to_pydatetime(),
+        }
+
+    # -------------------- Re-upload Detection --------------------
+    def fingerprint_file(self, file_path):
+        """
+        sha256 of the file's normalized (decompressed) content, computed in one streaming pass.
+        Line endings, trailing whitespace, blank lines and a UTF-8 BOM are ignored,
+        so the same export saved by a different tool hashes the same.
+        """
+        digest = hashlib.sha256()
+        with open_csv_stream(file_path) as handle:
+            first = True
+            for line in handle:
+                if first:
+                    line = line[len(UTF8_BOM):] if line.startswith(UTF8_BOM) else line
+                    first = False
+                line = line.rstrip()
+                if line:
+                    digest.update(line)
+                    digest.update(b'\n')
+        return digest.hexdigest()
+
+    def find_duplicate_upload(self, content_hash):
+        """Fingerprint of an earlier upload with identical content, or None"""
+        return UploadFingerprint.query.filter_by(content_hash=content_hash).first()
+
+    def _record_fingerprint(self, content_hash, source_filename, load):
+        """Remember this upload's content hash and date range"""
+        try:
+            db.session.add(UploadFingerprint(
+                content_hash=content_hash,
+                source_file=source_filename,
+                min_log_time=load['min_time'],
+                max_log_time=load['max_time'],
+                row_count=load['rows'],
+                skipped_rows=load['skipped']
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠ Could not record upload fingerprint: {e}")
 
-                raw_conn.commit()
+    # -------------------- COPY Sessions --------------------
+    @contextmanager
+    def _copy_session(self, tables=COPY_TABLES, batch_id=None):
+        """Raw DB-API cursor for COPY with triggers disabled, stamping batch_id; commits on success"""
+        raw_conn = db.engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cursor:
+                # Disable triggers for performance
+                self._set_triggers(cursor, tables, enabled=False)
+                self._stamp_batch(cursor, batch_id)
 
-            finally:
-                raw_conn.close()
+                yield cursor
 
-            # Step 5: Preserve TL info
-            self._preserve_team_leader_info()
+                # Re-enable triggers
+                self._set_triggers(cursor, tables, enabled=True)
 
-            # Step 6: Sync AgentInfo (from file 1)
-            self._update_agent_info()
+            raw_conn.commit()
 
-            # Step 7: Sync AgentList (from file 2)
-            self._sync_agent_list()
+        finally:
+            raw_conn.close()
 
-            elapsed = (datetime.now() - start_time).total_seconds()
-            print(f"🚀 Ingestion completed in {elapsed:.2f} seconds")
-            return True
+    @contextmanager
+    def _dual_copy_session(self, concurrent, batch_id=None):
+        """
+        Yield (raw_cursor, updated_cursor). When concurrent, each table gets its own
+        pooled connection and both are committed together with two-phase commit:
+        both PREPARE or both roll back. Otherwise both cursors share one connection.
+        """
+        if not concurrent:
+            with self._copy_session(batch_id=batch_id) as cursor:
+                yield cursor, cursor
+            return
 
+        gtrid = f"ingest-{uuid.uuid4().hex}"
+        connections = []
+        try:
+            try:
+                cursors = []
+                for table in COPY_TABLES:
+                    conn = db.engine.raw_connection()
+                    connections.append(conn)
+                    conn.rollback()  # tpc_begin needs a connection outside any transaction
+                    conn.tpc_begin(conn.xid(0, gtrid, table))
+                    cursor = conn.cursor()
+                    # Each connection only locks its own table, so the two COPYs never wait on each other
+                    self._set_triggers(cursor, (table,), enabled=False)
+                    self._stamp_batch(cursor, batch_id)
+                    cursors.append(cursor)
+
+                yield cursors[0], cursors[1]
+
+                for cursor, table in zip(cursors, COPY_TABLES):
+                    self._set_triggers(cursor, (table,), enabled=True)
+                for conn in connections:
+                    conn.tpc_prepare()
+            except BaseException:
+                for conn in connections:
+                    try:
+                        conn.tpc_rollback()
+                    except Exception:
+                        pass
+                raise
+
+            # Both branches are prepared: from here on the load can only be committed
+            try:
+                for conn in connections:
+                    conn.tpc_commit()
+            except Exception as e:
+                raise RuntimeError(
+                    f"Transaction '{gtrid}' is prepared but not fully committed; "
+                    f"finish it with COMMIT PREPARED: {e}"
+                )
+            print("✅ Raw + updated COPY committed (two-phase)")
+
+        finally:
+            for conn in connections:
+                conn.close()
+
+    def _stamp_batch(self, cursor, batch_id):
+        """Rows written by this transaction get batch_id through the batch_id column default"""
+        if batch_id is not None:
+            cursor.execute("SELECT set_config(%s, %s, true)", (BATCH_ID_SETTING, str(batch_id)))
+
+    def _set_triggers(self, cursor, tables, enabled):
+        """
+        Skip trigger work during a load. 'replica' switches session_replication_role for the
+        current transaction only (no table lock, nothing to undo on failure); 'alter' runs
+        ALTER TABLE ... TRIGGER ALL, whose ACCESS EXCLUSIVE lock stalls every reader.
+        """
+        if Config.INGEST_TRIGGER_MODE == 'replica':
+            if not enabled:
+                self._set_replica_role(cursor)
+            return
+        if Config.INGEST_TRIGGER_MODE != 'alter':
+            return
+
+        action = "ENABLE" if enabled else "DISABLE"
+        try:
+            for table in tables:
+                cursor.execute(f"ALTER TABLE {table} {action} TRIGGER ALL;")
+            print(f"✅ Triggers {action.lower()}d on {', '.join(tables)}")
+        except Exception as trigger_error:
+            print(f"⚠ Could not {action.lower()} triggers: {trigger_error}")
+
+    def _set_replica_role(self, cursor):
+        """SET LOCAL session_replication_role = replica, if this role may (superuser or granted SET)"""
+        if self._replica_role_supported is False:
+            return
+        cursor.execute("SAVEPOINT replica_role")
+        try:
+            cursor.execute("SET LOCAL session_replication_role = replica")
+            cursor.execute("RELEASE SAVEPOINT replica_role")
+            self._replica_role_supported = True
         except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT replica_role")
+            self._replica_role_supported = False
+            print(f"ℹ Cannot set session_replication_role, triggers stay enabled during COPY: {e}")
+
+    @contextmanager
+    def _source_file_lock(self, source_filename):
+        """
+        Hold pg_advisory_xact_lock(namespace, hashtext(source_file)) for the whole ingestion on
+        a connection of its own. The lock only conflicts with another load of the same file;
+        it is released when that transaction ends, including when the connection is discarded.
+        """
+        if db.engine.dialect.name != 'postgresql':
+            yield
+            return
+
+        raw_conn = db.engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cursor:
+                params = (INGEST_LOCK_NAMESPACE, source_filename)
+                cursor.execute("SELECT pg_try_advisory_xact_lock(%s, hashtext(%s))", params)
+                if not cursor.fetchone()[0]:
+                    print(f"⏳ Another ingestion of '{source_filename}' is running, waiting for it")
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", params)
+            yield
+        finally:
             try:
-                raw_conn = db.engine.raw_connection()
-                with raw_conn.cursor() as cursor:
-                    cursor.execute("ALTER TABLE raw_call_logs ENABLE TRIGGER ALL;")
-                    cursor.execute("ALTER TABLE updated_call_logs ENABLE TRIGGER ALL;")
-                raw_conn.commit()
+                raw_conn.rollback()
+            finally:
                 raw_conn.close()
-            except:
-                pass
 
-            db.session.rollback()
-            raise ValueError(f"Failed to ingest CSV: {str(e)}")
+    @contextmanager
+    def _staging_lease(self):
+        """
+        Hold pg_advisory_xact_lock_shared(STAGING_LOCK_NAMESPACE, 0) on a connection of its own
+        while parallel workers' committed rows wait in staging for this load to publish them.
+        sweep_staged_rows only deletes while nobody holds it; a dead load's lease ends with
+        its connection.
+        """
+        if db.engine.dialect.name != 'postgresql':
+            yield
+            return
+
+        raw_conn = db.engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock_shared(%s, 0)", (STAGING_LOCK_NAMESPACE,))
+            yield
+        finally:
+            try:
+                raw_conn.rollback()
+            finally:
+                raw_conn.close()
+
+    def _use_concurrent_copy(self):
+        """Concurrent dual-table COPY needs prepared transactions (max_prepared_transactions > 0)"""
+        if not Config.INGEST_CONCURRENT_COPY:
+            return False
+        if self._two_phase_supported is None:
+            try:
+                value = db.session.execute(text("SHOW max_prepared_transactions")).scalar()
+                self._two_phase_supported = int(value) > 0
+            except Exception as e:
+                print(f"⚠ Could not check max_prepared_transactions: {e}")
+                self._two_phase_supported = False
+            if not self._two_phase_supported:
+                print("ℹ Prepared transactions disabled on server; COPYs run on one connection")
+        return self._two_phase_supported
+
+    # -------------------- CSV Reading --------------------
+    def _should_stream(self, file_path):
+        # A compressed file's size says little about its inflated size, so it is always streamed
+        if is_compressed(file_path):
+            return True
+        size_mb = os.path.getsize(file_path) / (1024 * 1024)
+        return size_mb > Config.INGEST_STREAMING_THRESHOLD_MB
+
+    def _should_parallelize(self, file_path):
+        # Byte ranges need random access, so compressed files are never split
+        if Config.INGEST_PARALLEL_WORKERS < 2 or is_compressed(file_path):
+            return False
+        size_mb = os.path.getsize(file_path) / (1024 * 1024)
+        return size_mb > Config.INGEST_PARALLEL_THRESHOLD_MB
+
+    def _byte_ranges_start_on_rows(self, file_path):
+        """split_byte_ranges cuts at line breaks: check every cut falls between two rows"""
+        header, ranges = split_byte_ranges(file_path, Config.INGEST_PARALLEL_WORKERS)
+        return ranges_start_on_rows(file_path, header, ranges)
+
+    def _chunk_rows_for_budget(self, file_path, in_flight=1):
+        """Estimate rows per chunk from the average line width and the memory budget"""
+        bytes_per_row = sample_row_bytes(file_path)
+        budget = Config.INGEST_MEMORY_BUDGET_MB * 1024 * 1024 / in_flight
+        rows = int(budget / (bytes_per_row * CHUNK_MEMORY_FACTOR))
+        return max(MIN_CHUNK_ROWS, min(rows, MAX_CHUNK_ROWS))
+
+    def _scan_file(self, file_path, chunk_rows):
+        """Lightweight first pass over two columns: distinct cleaned agents, Log Time range, row count"""
+        with open_csv_stream(file_path) as handle:
+            return self._merge_scans([self._scan_stream(handle, chunk_rows)])
+
+    def _scan_stream(self, handle, chunk_rows):
+        """Raw agent names, Log Time range and row count of one CSV stream"""
+        raw_names = set()
+        min_time = max_time = None
+        rows = 0
+
+        reader = pd.read_csv(
+            handle,
+            encoding="utf-8-sig",
+            dtype={'Agent name': 'string'},
+            usecols=['Agent name', 'Log Time'],
+            chunksize=chunk_rows,
+            engine='c'
+        )
+        with reader:
+            for chunk in reader:
+                rows += len(chunk)
+                raw_names.update(chunk['Agent name'].dropna().unique())
+                log_time = pd.to_datetime(chunk['Log Time'], errors='coerce')
+                chunk_min, chunk_max = log_time.min(), log_time.max()
+                if pd.notnull(chunk_min) and (min_time is None or chunk_min < min_time):
+                    min_time = chunk_min
+                if pd.notnull(chunk_max) and (max_time is None or chunk_max > max_time):
+                    max_time = chunk_max
+
+        return {'names': raw_names, 'min_time': min_time, 'max_time': max_time, 'rows': rows}
 
     # -------------------- AgentInfo Sync (from File 1) --------------------
-    def _update_agent_info(self):
-        """Sync AgentInfo with updated_call_logs whenever hierarchy info changes"""
+    def _update_agent_info(self, agents):
+        """
+        Upsert AgentInfo for the agents in the just-ingested file from each agent's
+        latest updated_call_logs row; unchanged rows are left untouched.
+        """
         from app import db
-        from app.models import UpdatedCallLog, AgentInfo
+
+        agents = sorted({a for a in agents if isinstance(a, str) and a})
+        if not agents:
+            return 0, 0
 
         try:
-            latest_agents = db.session.query(
-                UpdatedCallLog.agent_name,
-                UpdatedCallLog.tm_name,
-                UpdatedCallLog.tl_name,
-                UpdatedCallLog.group_name
-            ).distinct().all()
-
-            new_count = 0
-            updated_count = 0
-            now = datetime.utcnow()
-
-            for agent_name, tm_name, tl_name, group_name in latest_agents:
-                existing = AgentInfo.query.filter_by(agent_name=agent_name).first()
-
-                if not existing:
-                    db.session.add(AgentInfo(
-                        agent_name=agent_name,
-                        tm_name=tm_name,
-                        tl_name=tl_name,
-                        group_name=group_name,
-                        updated_at=now
-                    ))
-                    new_count += 1
-                else:
-                    has_changes = False
-                    if existing.tm_name != tm_name:
-                        existing.tm_name = tm_name
-                        has_changes = True
-                    if existing.tl_name != tl_name:
-                        existing.tl_name = tl_name
-                        has_changes = True
-                    if existing.group_name != group_name:
-                        existing.group_name = group_name
-                        has_changes = True
-                    if has_changes:
-                        existing.updated_at = now
-                        updated_count += 1
+            result = db.session.execute(text("""
+                INSERT INTO agent_info (agent_name, tm_name, tl_name, group_name, updated_at)
+                SELECT a.agent_name, latest.tm_name, latest.tl_name, latest.group_name, :now
+                FROM unnest(CAST(:agents AS VARCHAR[])) AS a(agent_name)
+                CROSS JOIN LATERAL (
+                    SELECT u.tm_name, u.tl_name, u.group_name
+                    FROM updated_call_logs u
+                    WHERE u.agent_name = a.agent_name
+                    AND u.log_time IS NOT NULL
+                    ORDER BY u.log_time DESC
+                    LIMIT 1
+                ) latest
+                ON CONFLICT (agent_name) DO UPDATE
+                SET tm_name = EXCLUDED.tm_name,
+                    tl_name = EXCLUDED.tl_name,
+                    group_name = EXCLUDED.group_name,
+                    updated_at = EXCLUDED.updated_at
+                WHERE (agent_info.tm_name, agent_info.tl_name, agent_info.group_name)
+                    IS DISTINCT FROM (EXCLUDED.tm_name, EXCLUDED.tl_name, EXCLUDED.group_name)
+                RETURNING (xmax = 0) AS inserted
+            """), {'agents': agents, 'now': datetime.utcnow()})
+
+            inserted = [row[0] for row in result]
+            new_count = sum(1 for flag in inserted if flag)
+            updated_count = len(inserted) - new_count
 
             db.session.commit()
             print(f"✅ AgentInfo synced. {new_count} new, {updated_count} updated.")
+            return new_count, updated_count
 
         except Exception as e:
             db.session.rollback()
             print(f"⚠ Failed to update AgentInfo: {e}")
+            return 0, 0
 
     # -------------------- AgentList Sync (from File 2) --------------------
-    def _sync_agent_list(self):
-        """Sync new agents from UpdatedCallLog to AgentList table"""
-        try:
-            from app.models import AgentList
-            from app import db
-            from sqlalchemy import text
+    def _sync_agent_list(self, agents):
+        """
+        Add the uploaded agents to AgentList in one statement; the unique index on
+        agent_list.agent_name drops the ones already listed.
+        """
+        from app import db
 
-            existing_agents = {agent.agent_name for agent in AgentList.query.all()}
+        agents = sorted({a for a in agents if isinstance(a, str) and a})
+        if not agents:
+            print("ℹ No new agents to sync")
+            return 0
 
-            if not existing_agents:
-                result = db.session.execute(text("""
-                    SELECT DISTINCT agent_name 
-                    FROM updated_call_logs 
-                    WHERE agent_name IS NOT NULL
-                """))
-            else:
-                result = db.session.execute(text("""
-                    SELECT DISTINCT agent_name 
-                    FROM updated_call_logs 
-                    WHERE agent_name IS NOT NULL 
-                    AND agent_name NOT IN :existing_agents
-                """), {'existing_agents': tuple(existing_agents)})
-
-            new_agents = [row[0] for row in result if row[0] not in existing_agents]
-
-            if new_agents:
-                from app.models import AgentList
-                agents_to_add = [AgentList(agent_name=a) for a in new_agents]
-                db.session.bulk_save_objects(agents_to_add)
-                db.session.commit()
-                print(f"✅ Synced {len(new_agents)} new agents to AgentList")
+        try:
+            result = db.session.execute(text("""
+                INSERT INTO agent_list (agent_name)
+                SELECT unnest(CAST(:agents AS VARCHAR[]))
+                ON CONFLICT (agent_name) DO NOTHING
+            """), {'agents': agents})
+            new_count = result.rowcount
+            db.session.commit()
+
+            if new_count:
+                print(f"✅ Synced {new_count} new agents to AgentList")
             else:
                 print("ℹ No new agents to sync")
+            return new_count
 
         except Exception as e:
             db.session.rollback()
             print(f"⚠ AgentList sync failed: {e}")
+            return 0
 
     # -------------------- Fetch Previous Records --------------------
     def _fetch_previous_records_with_date_context(self, unique_agents, current_file_min_date, db):
-        """Fetch previous records (with status + hierarchy context)"""
-        if not unique_agents or current_file_min_date is None:
+        """
+        Fetch each agent's latest record before the file's first timestamp (status + hierarchy).
+        The file's agents are loaded into a temp table and resolved server-side with one
+        LATERAL probe per agent on ix_updated_call_logs_agent_log_time, so the cost
+        scales with the agents in the file rather than with their history.
+        """
+        agents = sorted({a for a in unique_agents if isinstance(a, str) and a})
+        if not agents or current_file_min_date is None or pd.isnull(current_file_min_date):
             return {}
 
-        previous_records = {}
-        try:
-            if isinstance(current_file_min_date, pd.Timestamp):
-                current_file_min_date = current_file_min_date.to_pydatetime()
-
-            batch_size = 500
-            for i in range(0, len(unique_agents), batch_size):
-                batch_agents = unique_agents[i:i + batch_size]
-
-                query = text("""
-                    SELECT agent_name, designation, role, group_name, tm_name, tl_name, status, log_time
-                    FROM updated_call_logs 
-                    WHERE agent_name IN :agents
-                    AND log_time < :cutoff_date
-                    ORDER BY log_time DESC
-                """)
-
-                result = db.session.execute(query, {
-                    'agents': tuple(batch_agents),
-                    'cutoff_date': current_file_min_date
-                }).fetchall()
-
-                for row in result:
-                    agent_name = row[0]
-                    if agent_name not in previous_records:
-                        previous_records[agent_name] = {
-                            'designation': row[1] or 'Agent',
-                            'role': row[2] or 'Full-Timer',
-                            'group_name': row[3] or '',
-                            'tm_name': row[4] or '',
-                            'tl_name': row[5] or '',
-                            'status': row[6] or 'Employee',
-                            'last_seen': row[7]
-                        }
+        if isinstance(current_file_min_date, pd.Timestamp):
+            current_file_min_date = current_file_min_date.to_pydatetime()
 
+        # Own short transaction on its own connection: the caller's session is not committed,
+        # and the temp table drops when it ends
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(text("""
+                    CREATE TEMP TABLE IF NOT EXISTS ingest_agents (
+                        agent_name VARCHAR(100) PRIMARY KEY
+                    ) ON COMMIT DROP
+                """))
+                conn.execute(text("""
+                    INSERT INTO ingest_agents (agent_name)
+                    SELECT unnest(CAST(:agents AS VARCHAR[]))
+                    ON CONFLICT DO NOTHING
+                """), {'agents': agents})
+
+                result = conn.execute(text("""
+                    SELECT a.agent_name, p.designation, p.role, p.group_name,
+                           p.tm_name, p.tl_name, p.status, p.log_time
+                    FROM ingest_agents a
+                    CROSS JOIN LATERAL (
+                        SELECT u.designation, u.role, u.group_name, u.tm_name,
+                               u.tl_name, u.status, u.log_time
+                        FROM updated_call_logs u
+                        WHERE u.agent_name = a.agent_name
+                        AND u.log_time < :cutoff_date
+                        ORDER BY u.log_time DESC
+                        LIMIT 1
+                    ) p
+                """), {'cutoff_date': current_file_min_date}).fetchall()
         except Exception as e:
+            # Loading on without the history would give every agent the default hierarchy
             print(f"❌ Error fetching previous records: {e}")
-            previous_records = self._fetch_previous_records_simple(unique_agents, db)
-
-        return previous_records
-
-    def _fetch_previous_records_simple(self, unique_agents, db):
-        """Fallback previous record fetch"""
-        if not unique_agents:
-            return {}
+            raise
 
         previous_records = {}
-        try:
-            batch_size = 1000
-            for i in range(0, len(unique_agents), batch_size):
-                batch_agents = unique_agents[i:i + batch_size]
-
-                query = text("""
-                    SELECT DISTINCT ON (agent_name) 
-                        agent_name, 
-                        COALESCE(designation, 'Agent') as designation,
-                        COALESCE(role, 'Full-Timer') as role,
-                        COALESCE(group_name, '') as group_name,
-                        COALESCE(tm_name, '') as tm_name,
-                        COALESCE(tl_name, '') as tl_name,
-                        COALESCE(status, 'Employee') as status
-                    FROM updated_call_logs 
-                    WHERE agent_name = ANY(:agents)
-                    ORDER BY agent_name, log_time DESC
-                """)
-
-                result = db.session.execute(query, {'agents': batch_agents})
-
-                for row in result:
-                    previous_records[row['agent_name']] = {
-                        'designation': row['designation'],
-                        'role': row['role'],
-                        'group_name': row['group_name'],
-                        'tm_name': row['tm_name'],
-                        'tl_name': row['tl_name'],
-                        'status': row['status']
-                    }
-
-        except Exception as e:
-            print(f"⚠ Could not fetch previous records: {e}")
-
+        for row in result:
+            previous_records[row[0]] = {
+                'designation': row[1] or 'Agent',
+                'role': row[2] or 'Full-Timer',
+                'group_name': row[3] or '',
+                'tm_name': row[4] or '',
+                'tl_name': row[5] or '',
+                'status': row[6] or 'Employee',
+                'last_seen': row[7]
+            }
+
+        print(f"   Previous records found for {len(previous_records):,} of {len(agents):,} agents")
         return previous_records
 
     # -------------------- CSV Builders --------------------
-    def _create_raw_csv_data(self, df, source_filename):
-        """Prepare CSV buffer for raw_call_logs COPY"""
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        for _, row in df.iterrows():
-            log_time = ""
-            if pd.notnull(row['Log Time']):
-                try:
-                    log_time = row['Log Time'].isoformat()
-                except Exception:
-                    log_time = ""
-
-            writer.writerow([
-                str(row['Agent name']).strip(),
-                str(row['Profile ID']).strip(),
-                str(row['Call Log ID']).strip(),
-                log_time,
-                str(row['Log Type']).strip(),
-                str(row['State']).strip(),
-                str(row['Call type']).strip(),
-                str(row['Original campaign']).strip(),
-                str(row['Current campaign']).strip(),
-                str(row['Ember']).strip(),
-                source_filename
-            ])
-
-        output.seek(0)
-        return output
-
-    def _create_updated_csv_data(self, df, source_filename, previous_records):
-        """Prepare CSV buffer for updated_call_logs COPY"""
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        part_timer_count = 0
-
-        for _, row in df.iterrows():
-            raw_name = str(row['Agent name']).strip()
-            agent, role = clean_agent_name(raw_name)
-            if role == "Part-Timer":
-                part_timer_count += 1
-
-            prev_data = previous_records.get(agent, {})
-            log_time = ""
-            if pd.notnull(row['Log Time']):
-                try:
-                    log_time = row['Log Time'].isoformat()
-                except Exception:
-                    log_time = ""
-
-            team_leader = TeamLeader.query.filter_by(name=agent).first()
-
-            if team_leader:
-                designation = "TL"
-                tl_name = "Self"
-                tm_name = team_leader.tm_name or prev_data.get('tm_name', '')
-                group_name = team_leader.group_name or prev_data.get('group_name', '')
-            else:
-                designation = prev_data.get('designation', Config.DEFAULT_DESIGNATION)
-                tl_name = prev_data.get('tl_name', '')
-                tm_name = prev_data.get('tm_name', '')
-                group_name = prev_data.get('group_name', '')
-                if designation == "TL":
-                    tl_name = "Self"
-                elif designation == Config.DEFAULT_DESIGNATION:
-                    tl_name = prev_data.get('tl_name', '')
-                elif designation == "TM":
-                    tl_name = ""
-
-            status = prev_data.get('status', 'Employee')
-
-            writer.writerow([
-                agent,
-                str(row['Profile ID']).strip(),
-                str(row['Call Log ID']).strip(),
-                log_time,
-                str(row['Log Type']).strip(),
-                str(row['State']).strip(),
-                str(row['Call type']).strip(),
-                str(row['Original campaign']).strip(),
-                str(row['Current campaign']).strip(),
-                str(row['Ember']).strip(),
-                designation,
-                role,
-                group_name,
-                tm_name,
-                tl_name,
-                source_filename,
-                status
-            ])
+    def _build_raw_frame(self, df, source_filename):
+        """raw_call_logs rows in COPY column order"""
+        return pd.DataFrame({
+            'agent_name': self._strip_column(df['Agent name']),
+            **self._file_columns(df),
+            'source_file': source_filename,
+        })
+
+    def _build_updated_frame(self, df, source_filename, hierarchy):
+        """updated_call_logs rows in COPY column order, hierarchy broadcast from the per-agent frame"""
+        agents, roles = self._resolve_agent_names(df['Agent name'])
+        part_timer_count = int((roles == "Part-Timer").sum())
+
+        # Hierarchy is decided once per unique agent, then broadcast to rows
+        per_row = hierarchy.reindex(agents)
 
         print(f"   Detected {part_timer_count} part-timer records")
-        output.seek(0)
-        return output
+        return pd.DataFrame({
+            'agent_name': agents,
+            **self._file_columns(df),
+            'designation': per_row['designation'].to_numpy(),
+            'role': roles,
+            'group_name': per_row['group_name'].to_numpy(),
+            'tm_name': per_row['tm_name'].to_numpy(),
+            'tl_name': per_row['tl_name'].to_numpy(),
+            'source_file': source_filename,
+            'status': per_row['status'].to_numpy(),
+        })
+
+    def _file_columns(self, df):
+        """Call-log columns shared by both tables, in COPY order (stripped, NA kept as NULL)"""
+        return {
+            'profile_id': self._strip_column(df['Profile ID']),
+            'call_log_id': self._strip_column(df['Call Log ID']),
+            'log_time': pd.to_datetime(df['Log Time'], errors='coerce').to_numpy(),
+            'log_type': self._strip_column(df['Log Type']),
+            'state': self._strip_column(df['State']),
+            'call_type': self._strip_column(df['Call type']),
+            'original_campaign': self._strip_column(df['Original campaign']),
+            'current_campaign': self._strip_column(df['Current campaign']),
+            'ember': self._strip_column(df['Ember']),
+        }
+
+    def _strip_column(self, column):
+        return strip_values(column)
+
+    def _resolve_agent_names(self, names):
+        """Clean agent names once per distinct value; returns (agent, role) arrays aligned to rows"""
+        # Categoricals are factorized through their codes; NA becomes ''
+        return normalize_agent_names(strip_values(names))
+
+    def _load_team_leader_lookup(self):
+        """Preload TeamLeader TM/group by name (one record per name, see TEAM_LEADERS_SQL)"""
+        rows = db.session.execute(text(TEAM_LEADERS_SQL)).all()
+        lookup = pd.DataFrame(rows, columns=['name', 'tm_name', 'group_name'])
+        return lookup.set_index('name')
+
+    def _build_hierarchy_lookup(self, agents, previous_records):
+        """
+        Build the per-agent hierarchy frame (designation, group, TM, TL, status).
+        Team leaders get designation TL / tl_name Self and take TM/group from the
+        TeamLeader table, falling back to the agent's previous record.
+        """
+        index = pd.Index(agents, name='agent_name')
+        previous = pd.DataFrame.from_dict(previous_records, orient='index')
+        previous = previous.reindex(
+            index=index,
+            columns=['designation', 'group_name', 'tm_name', 'tl_name', 'status']
+        )
+
+        designation = previous['designation'].fillna(Config.DEFAULT_DESIGNATION)
+        group_name = previous['group_name'].fillna('')
+        tm_name = previous['tm_name'].fillna('')
+        tl_name = previous['tl_name'].fillna('')
+        tl_name = tl_name.mask(designation == "TL", "Self").mask(designation == "TM", "")
+
+        team_leaders = self._load_team_leader_lookup()
+        is_tl = index.isin(team_leaders.index)
+        tl_info = team_leaders.reindex(index).replace('', np.nan)
+
+        return pd.DataFrame({
+            'designation': designation.mask(is_tl, "TL"),
+            'group_name': group_name.mask(is_tl, tl_info['group_name'].fillna(group_name)),
+            'tm_name': tm_name.mask(is_tl, tl_info['tm_name'].fillna(tm_name)),
+            'tl_name': tl_name.mask(is_tl, "Self"),
+            'status': previous['status'].fillna('Employee'),
+        }, index=index)
+
+    def _iter_copy_pieces(self, frame, on_rows=None, rows_per_piece=COPY_PIECE_ROWS):
+        """
+        Yield a COPY-ordered frame as slices in the session's COPY format (binary tuples
+        or CSV text), for CopyStream; on_rows(n) fires once a slice is consumed
+        """
+        binary = self._copy_format() == 'binary'
+        if binary:
+            yield PGCOPY_HEADER
+        for start in range(0, len(frame), rows_per_piece):
+            piece = frame.iloc[start:start + rows_per_piece]
+            if binary:
+                yield encode_frame(piece)
+            else:
+                yield piece.to_csv(header=False, index=False, date_format=COPY_TIMESTAMP_FORMAT)
+            if on_rows is not None:
+                on_rows(len(piece))
+        if binary:
+            yield PGCOPY_TRAILER
 
     # -------------------- COPY commands --------------------
-    def _insert_raw_copy(self, cursor, csv_data):
-        cursor.copy_expert("""
-            COPY raw_call_logs (agent_name, profile_id, call_log_id, log_time, 
-                              log_type, state, call_type, original_campaign, 
-                              current_campaign, ember, source_file) 
-            FROM STDIN WITH (FORMAT CSV)
-        """, csv_data)
-
-    def _insert_updated_copy(self, cursor, csv_data):
-        cursor.copy_expert("""
-            COPY updated_call_logs (agent_name, profile_id, call_log_id, log_time, 
-                                  log_type, state, call_type, original_campaign, 
-                                  current_campaign, ember, designation, role, 
-                                  group_name, tm_name, tl_name, source_file, status) 
-            FROM STDIN WITH (FORMAT CSV)
-        """, csv_data)
+    def _insert_raw_copy(self, cursor, csv_data, target=None):
+        cursor.copy_expert(f"""
+            COPY {target or self._copy_target('raw_call_logs')} ({RAW_COPY_COLUMNS})
+            FROM STDIN WITH (FORMAT {self._copy_format().upper()})
+        """, csv_data, size=COPY_READ_SIZE)
+
+    def _insert_updated_copy(self, cursor, csv_data, target=None):
+        cursor.copy_expert(f"""
+            COPY {target or self._copy_target('updated_call_logs')} ({UPDATED_COPY_COLUMNS})
+            FROM STDIN WITH (FORMAT {self._copy_format().upper()})
+        """, csv_data, size=COPY_READ_SIZE)
+
+    def _timed_copy(self, stats, table, cursor, frame, on_rows=None, target=None):
+        """COPY a frame into table, charging encoding and server time to separate stages"""
+        insert = self._insert_raw_copy if table == 'raw_call_logs' else self._insert_updated_copy
+        stream = CopyStream(self._iter_copy_pieces(frame, on_rows))
+        started = time.perf_counter()
+        insert(cursor, stream, target=target)
+        elapsed = time.perf_counter() - started
+        stats.add(f"Encode {table}", stream.source_seconds, len(frame), stream.bytes)
+        stats.add(f"COPY {table}", elapsed - stream.source_seconds, len(frame), stream.bytes)
+
+    def _copy_format(self):
+        """'binary' on PostgreSQL unless INGEST_COPY_FORMAT forces 'csv' (or 'binary')"""
+        if self._copy_format_name is None:
+            if Config.INGEST_COPY_FORMAT in ('binary', 'csv'):
+                self._copy_format_name = Config.INGEST_COPY_FORMAT
+            else:
+                self._copy_format_name = 'binary' if db.engine.dialect.name == 'postgresql' else 'csv'
+        return self._copy_format_name
+
+    # -------------------- Row Dedup --------------------
+    def _copy_target(self, table):
+        """COPY goes to the staging table when INGEST_DEDUP_ROWS is on"""
+        return STAGING_TABLES[table] if Config.INGEST_DEDUP_ROWS else table
+
+    def _publish_staged_rows(self, raw_cursor, updated_cursor, concurrent, staged_rows, progress=_no_progress,
+                             stats=None):
+        """
+        Move this transaction's staged rows into raw/updated_call_logs with
+        INSERT ... ON CONFLICT DO NOTHING, so rows whose (call_log_id, log_time, log_type)
+        is already loaded are skipped. Returns the number of rows inserted.
+        """
+        if not Config.INGEST_DEDUP_ROWS:
+            return staged_rows
+
+        progress("Skipping duplicate rows", rows=staged_rows, total=staged_rows)
+        with (stats or IngestionStats()).stage("Publish staged rows", rows=staged_rows):
+            if concurrent:
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    raw_future = executor.submit(self._publish_staged, raw_cursor, 'raw_call_logs', RAW_COPY_COLUMNS)
+                    updated_inserted = self._publish_staged(updated_cursor, 'updated_call_logs', UPDATED_COPY_COLUMNS)
+                    raw_inserted = raw_future.result()
+            else:
+                raw_inserted = self._publish_staged(raw_cursor, 'raw_call_logs', RAW_COPY_COLUMNS)
+                updated_inserted = self._publish_staged(updated_cursor, 'updated_call_logs', UPDATED_COPY_COLUMNS)
+
+        if raw_inserted != updated_inserted:
+            print(f"⚠ Dedup kept {raw_inserted:,} raw vs {updated_inserted:,} updated rows")
+
+        duplicates = staged_rows - updated_inserted
+        if duplicates:
+            print(f"🔁 {duplicates:,} duplicate rows skipped (call_log_id, log_time, log_type already loaded)")
+        return updated_inserted
+
+    def _publish_staged(self, cursor, table, columns, load_ids=None):
+        """Publish the staged rows of this transaction, or of the given load ids (parallel workers)"""
+        if load_ids is None:
+            condition, params = "load_id = txid_current()", None
+        else:
+            condition, params = "load_id = ANY(%s)", (list(load_ids),)
+        conflict = "ON CONFLICT DO NOTHING" if Config.INGEST_DEDUP_ROWS else ""
+
+        cursor.execute(f"""
+            INSERT INTO {table} ({columns})
+            SELECT {columns} FROM {STAGING_TABLES[table]}
+            WHERE {condition}
+            {conflict}
+        """, params)
+        inserted = cursor.rowcount
+        cursor.execute(f"DELETE FROM {STAGING_TABLES[table]} WHERE {condition}", params)
+        return inserted
+
+    def _discard_staged(self, load_ids):
+        """Drop rows that parallel workers staged for a load that is not being published"""
+        if not load_ids:
+            return
+        raw_conn = db.engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cursor:
+                for table in COPY_TABLES:
+                    cursor.execute(f"DELETE FROM {STAGING_TABLES[table]} WHERE load_id = ANY(%s)", (list(load_ids),))
+            raw_conn.commit()
+        except Exception as e:
+            print(f"⚠ Could not discard staged rows of load ids {load_ids}: {e}")
+        finally:
+            raw_conn.close()
 
     # -------------------- Preserve TL Info --------------------
-    def _preserve_team_leader_info(self):
-        """Preserve TeamLeader TM/Group info after upload"""
+    def _preserve_team_leader_info(self, batch_id, min_time, max_time):
+        """
+        Re-stamp TeamLeader TM/Group onto the TL rows of this upload in one statement.
+        Only rows of this batch within the file's Log Time range are considered
+        (reached through the agent/log_time index), and only where a value differs.
+        """
+        from app import db
+
+        if min_time is None or max_time is None:
+            return 0
+
         try:
-            from app.models import TeamLeader, UpdatedCallLog
-            from app import db
-            team_leaders = TeamLeader.query.filter(TeamLeader.is_active == True).all()
-
-            for tl in team_leaders:
-                latest_record = UpdatedCallLog.query.filter(
-                    UpdatedCallLog.agent_name == tl.name,
-                    UpdatedCallLog.designation == 'TL'
-                ).order_by(UpdatedCallLog.log_time.desc()).first()
-
-                if latest_record:
-                    update_values = {}
-                    if tl.tm_name:
-                        update_values['tm_name'] = tl.tm_name
-                    elif latest_record.tm_name:
-                        update_values['tm_name'] = latest_record.tm_name
-
-                    if tl.group_name:
-                        update_values['group_name'] = tl.group_name
-                    elif latest_record.group_name:
-                        update_values['group_name'] = latest_record.group_name
-
-                    if update_values:
-                        UpdatedCallLog.query.filter(
-                            UpdatedCallLog.agent_name == tl.name,
-                            UpdatedCallLog.designation == 'TL'
-                        ).update(update_values)
-                        print(f"✅ Preserved TL '{tl.name}': TM='{update_values.get('tm_name', 'N/A')}', Group='{update_values.get('group_name', 'N/A')}'")
+            result = db.session.execute(text(f"""
+                UPDATE updated_call_logs u
+                SET tm_name = COALESCE(tl.tm_name, u.tm_name),
+                    group_name = COALESCE(tl.group_name, u.group_name)
+                FROM ({TEAM_LEADERS_SQL}) tl
+                WHERE u.agent_name = tl.name
+                AND u.designation = 'TL'
+                AND u.batch_id = :batch_id
+                AND u.log_time BETWEEN :min_time AND :max_time
+                AND (
+                    u.tm_name IS DISTINCT FROM COALESCE(tl.tm_name, u.tm_name)
+                    OR u.group_name IS DISTINCT FROM COALESCE(tl.group_name, u.group_name)
+                )
+            """), {'batch_id': batch_id, 'min_time': min_time, 'max_time': max_time})
+            updated = result.rowcount
 
             db.session.commit()
-            print("✅ TeamLeader info preserved")
+            print(f"✅ TeamLeader info preserved ({updated:,} rows re-stamped)")
+            return updated
 
         except Exception as e:
-            from app import db
             db.session.rollback()
             print(f"⚠ Could not preserve TeamLeader info: {e}")
+            return 0
+
+
+# -------------------- Staging Sweep --------------------
+def sweep_staged_rows():
+    """
+    Delete staged rows left behind by parallel loads whose process died after its workers
+    committed but before it published or discarded them. Rows are only swept while no
+    parallel load holds a staging lease; rows of transactions still in progress are kept
+    (and are invisible here anyway). Returns the rows deleted.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return 0
+    deleted = 0
+    raw_conn = db.engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_xact_lock(%s, 0)", (STAGING_LOCK_NAMESPACE,))
+            if not cursor.fetchone()[0]:
+                return 0
+            for table in COPY_TABLES:
+                cursor.execute(f"""
+                    DELETE FROM {STAGING_TABLES[table]}
+                    WHERE load_id NOT IN (SELECT txid_snapshot_xip(txid_current_snapshot()))
+                """)
+                deleted += cursor.rowcount
+        raw_conn.commit()
+    finally:
+        raw_conn.close()
+    if deleted:
+        print(f"🧹 Deleted {deleted:,} orphaned staging rows")
+    return deleted
+
+
+# -------------------- Worker Processes --------------------
+_worker_app = None
+
+
+def worker_app():
+    """Flask app for code running in a spawned worker process (created once per process)"""
+    global _worker_app
+    if _worker_app is None:
+        from app import create_app
+        _worker_app = create_app()
+    return _worker_app
+
+
+def _scan_range(file_path, header, start, end, chunk_rows):
+    with IngestionStats().track_memory() as stats:
+        with open_csv_range(file_path, header, start, end) as handle:
+            scan = DataIngestionManager()._scan_stream(handle, chunk_rows)
+    scan['peak_rss_mb'] = stats.peak_rss_mb()
+    return scan
+
+
+def _copy_range(file_path, header, start, end, source_filename, hierarchy, chunk_rows, copy_format):
+    with worker_app().app_context():
+        manager = DataIngestionManager()
+        manager._copy_format_name = copy_format
+        try:
+            return manager._copy_byte_range(
+                file_path, header, start, end, source_filename, hierarchy, chunk_rows
+            )
+        finally:
+            db.session.remove()
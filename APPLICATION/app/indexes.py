@@ -0,0 +1,197 @@
+"""
+Secondary indexes of the call-log tables for the Agent Management System.
+Indexes added after a table was first created are built here instead of in create_app:
+at app start only on empty tables, otherwise with `flask indexes build`, which uses
+CREATE INDEX CONCURRENTLY so uploads and readers keep running while it builds.
+See DOCUMENTATION.txt for detailed data processing descriptions.
+"""
+
+from sqlalchemy import text
+from app import db
+from app.partitions import is_partitioned
+
+# (index name, table, columns, unique)
+CALL_LOG_INDEXES = (
+    ('ix_raw_call_logs_batch_id', 'raw_call_logs', ('batch_id',), False),
+    ('ix_updated_call_logs_batch_id', 'updated_call_logs', ('batch_id',), False),
+    ('ix_updated_call_logs_agent_log_time', 'updated_call_logs', ('agent_name', 'log_time'), False),
+    ('ux_raw_call_logs_call_key', 'raw_call_logs', ('call_log_id', 'log_time', 'log_type'), True),
+    ('ux_updated_call_logs_call_key', 'updated_call_logs', ('call_log_id', 'log_time', 'log_type'), True),
+)
+
+
+def dedup_key_name(table):
+    """Unique (call_log_id, log_time, log_type) index that INSERT ... ON CONFLICT DO NOTHING relies on"""
+    return f"ux_{table}_call_key"
+
+
+def missing_dedup_keys(tables=('raw_call_logs', 'updated_call_logs')):
+    """Dedup key indexes that are missing or not valid yet (PostgreSQL only)"""
+    if db.engine.dialect.name != 'postgresql':
+        return []
+    missing = []
+    for table in tables:
+        valid = db.session.execute(
+            text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+            {'name': dedup_key_name(table)}
+        ).scalar()
+        if not valid:
+            missing.append(dedup_key_name(table))
+    return missing
+
+
+def _index_state(cursor, name):
+    """'missing', 'valid' or 'invalid' (a failed concurrent build, or a partitioned index still being built)"""
+    cursor.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (name,))
+    row = cursor.fetchone()
+    if row is None:
+        return 'missing'
+    return 'valid' if row[0] else 'invalid'
+
+
+def _create_sql(name, table, columns, unique, concurrently=False, only=False):
+    return (
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS "
+        f"{name} ON {'ONLY ' if only else ''}{table} ({', '.join(columns)})"
+    )
+
+
+def ensure_indexes():
+    """
+    App start: create missing call-log indexes on tables that are still empty (instant),
+    and only report them on populated tables, where building would block writes.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return
+    pending = []
+    raw_conn = db.engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cursor:
+            for name, table, columns, unique in CALL_LOG_INDEXES:
+                if _index_state(cursor, name) == 'valid':
+                    continue
+                cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+                if not cursor.fetchone()[0]:
+                    continue
+                cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+                if cursor.fetchone()[0] or _index_state(cursor, name) == 'invalid':
+                    pending.append(name)
+                    continue
+                cursor.execute(_create_sql(name, table, columns, unique))
+        raw_conn.commit()
+    finally:
+        raw_conn.close()
+    if pending:
+        print(f"ℹ Missing or invalid indexes {', '.join(pending)}; run `flask indexes build`")
+    if any(name.startswith('ux_') for name in pending):
+        print("⚠ Uploads are refused until the dedup keys are built (INGEST_DEDUP_ROWS is on)")
+
+
+def build_indexes():
+    """
+    Build every missing or invalid call-log index without blocking writes, in autocommit.
+    A plain table gets CREATE INDEX CONCURRENTLY (an invalid leftover of an interrupted
+    build is dropped first). A partitioned table cannot build concurrently, so the index is
+    created ON ONLY the parent, built concurrently on each partition and attached; the parent
+    index becomes valid once every partition's is attached. Rows that would break a unique
+    key are deleted first, keeping the oldest (lowest id) row of each key. Returns the
+    indexes built.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return []
+    built = []
+    # Every statement commits on its own: CONCURRENTLY cannot run inside a transaction
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        with conn.connection.cursor() as cursor:
+            for name, table, columns, unique in CALL_LOG_INDEXES:
+                if _index_state(cursor, name) == 'valid':
+                    continue
+                try:
+                    if unique:
+                        _delete_duplicate_keys(cursor, table, columns)
+                    if is_partitioned(cursor, table):
+                        _build_partitioned(cursor, name, table, columns, unique)
+                    else:
+                        _build_concurrently(cursor, name, table, columns, unique)
+                    built.append(name)
+                    print(f"✅ Index {name} built")
+                except Exception as e:
+                    print(f"⚠ Could not build {name}{' (existing duplicate rows?)' if unique else ''}: {e}")
+    return built
+
+
+def _delete_duplicate_keys(cursor, table, columns):
+    """
+    Delete every row whose key is already held by a row with a lower id, one partition at
+    a time (a key's rows share log_time, so they share a partition). Each partition is one
+    statement, which also takes raw rows out of the upload catalog's per-date and batch counts.
+    """
+    if is_partitioned(cursor, table):
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass ORDER BY c.relname", (table,)
+        )
+        parts = [row[0] for row in cursor.fetchall()]
+    else:
+        parts = [table]
+
+    key = ', '.join(columns)
+    # NULLs never collide in a unique index, so rows with a NULL key column are left alone
+    matches = ' AND '.join(f"t.{column} = d.{column}" for column in columns)
+    catalog = """
+        , per_date AS (
+            UPDATE upload_batch_dates bd SET rows = greatest(bd.rows - g.rows, 0)
+            FROM (SELECT batch_id, log_time::date AS log_date, count(*) AS rows
+                  FROM gone WHERE batch_id IS NOT NULL GROUP BY 1, 2) g
+            WHERE bd.batch_id = g.batch_id AND bd.log_date = g.log_date
+        ), per_batch AS (
+            UPDATE upload_batches b SET rows = greatest(b.rows - g.rows, 0)
+            FROM (SELECT batch_id, count(*) AS rows FROM gone WHERE batch_id IS NOT NULL GROUP BY 1) g
+            WHERE b.id = g.batch_id
+        )
+    """ if table == 'raw_call_logs' else ""
+    for part in parts:
+        cursor.execute(f"""
+            WITH gone AS (
+                DELETE FROM {part} t
+                USING (
+                    SELECT {key}, min(id) AS keep_id FROM {part}
+                    GROUP BY {key} HAVING count(*) > 1
+                ) d
+                WHERE {matches} AND t.id <> d.keep_id
+                RETURNING t.batch_id, t.log_time
+            ){catalog}
+            SELECT count(*) FROM gone
+        """)
+        deleted = cursor.fetchone()[0]
+        if deleted:
+            print(f"🧹 Deleted {deleted:,} duplicate rows from {part}")
+
+
+def _build_concurrently(cursor, name, table, columns, unique):
+    if _index_state(cursor, name) == 'invalid':
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    try:
+        cursor.execute(_create_sql(name, table, columns, unique, concurrently=True))
+    except Exception:
+        # A failed concurrent build leaves an invalid index that still slows down writes
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        raise
+
+
+def _build_partitioned(cursor, name, table, columns, unique):
+    cursor.execute(_create_sql(name, table, columns, unique, only=True))
+    # Partitions whose index is already attached to the parent index are done
+    cursor.execute(
+        "SELECT c.relname, EXISTS ("
+        "  SELECT 1 FROM pg_inherits ii JOIN pg_index ix ON ix.indexrelid = ii.inhrelid"
+        "  WHERE ii.inhparent = %s::regclass AND ix.indrelid = c.oid"
+        ") FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+        (name, table)
+    )
+    for partition, attached in cursor.fetchall():
+        if attached:
+            continue
+        partition_index = name.replace(table, partition, 1)
+        _build_concurrently(cursor, partition_index, partition, columns, unique)
+        cursor.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}")
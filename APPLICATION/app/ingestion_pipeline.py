@@ -0,0 +1,192 @@
+"""
+Staged ingestion pipeline for the Agent Management System.
+A source iterator and a chain of stage functions run in their own threads,
+connected by bounded queues, so parsing, enrichment and COPY overlap.
+See DOCUMENTATION.txt for detailed data processing descriptions.
+"""
+
+import queue
+import threading
+import time
+
+_DONE = object()
+_POLL_SECONDS = 0.2
+
+
+class PipelineAborted(Exception):
+    """Raised inside a stage thread when another stage has failed"""
+
+
+class StageStats:
+    """Counters for one pipeline stage (items, rows, busy/wait time, inbound queue depth)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+
+    def sample_depth(self, depth):
+        self.queue_depth = depth
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self._depth_total += depth
+        self._depth_samples += 1
+
+    def as_dict(self):
+        return {
+            'stage': self.name,
+            'items': self.items,
+            'rows': self.rows,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'wait_seconds': round(self.wait_seconds, 3),
+            'rows_per_sec': round(self.rows / self.busy_seconds) if self.busy_seconds else 0,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'avg_queue_depth': round(self._depth_total / self._depth_samples, 2) if self._depth_samples else 0,
+        }
+
+
+class IngestionPipeline:
+    """
+    Run source -> stage_1 -> ... -> stage_n, one thread per step.
+    Each stage is (name, func); func receives the previous step's item and returns
+    the next item (the last stage's return value is discarded). Rows are counted
+    with len(item). Bounded queues give backpressure: a fast producer blocks
+    until the slower consumer catches up.
+    """
+
+    def __init__(self, source, stages, source_name='read', queue_size=2):
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stats = [StageStats(source_name)] + [StageStats(name) for name, _ in stages]
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self._abort = threading.Event()
+        self._error = None
+        self._error_lock = threading.Lock()
+
+    def run(self):
+        """Run all stages to completion; re-raises the first stage error"""
+        threads = [threading.Thread(target=self._run_source, name='ingest-read', daemon=True)]
+        for index, (name, func) in enumerate(self.stages):
+            threads.append(threading.Thread(
+                target=self._run_stage, args=(index, func), name=f'ingest-{name}', daemon=True
+            ))
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._error is not None:
+            raise self._error
+        return self.stats_summary()
+
+    def stats_summary(self):
+        return [stats.as_dict() for stats in self.stats]
+
+    def bottleneck(self):
+        """Stage with the most busy time"""
+        return max(self.stats, key=lambda stats: stats.busy_seconds).name
+
+    # -------------------- Stage Threads --------------------
+    def _run_source(self):
+        stats = self.stats[0]
+        outbound = self._queues[0] if self._queues else None
+        try:
+            iterator = iter(self.source)
+            while not self._abort.is_set():
+                started = time.perf_counter()
+                item = next(iterator, _DONE)
+                stats.busy_seconds += time.perf_counter() - started
+                if item is _DONE:
+                    break
+                self._count(stats, item)
+                if outbound is not None:
+                    self._put(outbound, item, stats)
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            self._fail(e)
+        finally:
+            if outbound is not None:
+                self._put_done(outbound)
+
+    def _run_stage(self, index, func):
+        stats = self.stats[index + 1]
+        inbound = self._queues[index]
+        outbound = self._queues[index + 1] if index + 1 < len(self._queues) else None
+        try:
+            while True:
+                item = self._get(inbound, stats)
+                if item is _DONE:
+                    break
+                stats.sample_depth(inbound.qsize())
+
+                started = time.perf_counter()
+                result = func(item)
+                stats.busy_seconds += time.perf_counter() - started
+                self._count(stats, item)
+
+                if outbound is not None:
+                    self._put(outbound, result, stats)
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            self._fail(e)
+        finally:
+            if outbound is not None:
+                self._put_done(outbound)
+
+    # -------------------- Queue Helpers --------------------
+    def _count(self, stats, item):
+        stats.items += 1
+        try:
+            stats.rows += len(item)
+        except TypeError:
+            pass
+
+    def _put(self, target, item, stats):
+        started = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                target.put(item, timeout=_POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        stats.wait_seconds += time.perf_counter() - started
+
+    def _get(self, source, stats):
+        started = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                item = source.get(timeout=_POLL_SECONDS)
+                break
+            except queue.Empty:
+                continue
+        stats.wait_seconds += time.perf_counter() - started
+        return item
+
+    def _put_done(self, target):
+        # Downstream stages exit on _DONE or on abort, whichever they see first
+        while not self._abort.is_set():
+            try:
+                target.put(_DONE, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def _fail(self, error):
+        with self._error_lock:
+            if self._error is None:
+                self._error = error
+        self._abort.set()
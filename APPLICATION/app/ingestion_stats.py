@@ -0,0 +1,185 @@
+"""
+Per-stage ingestion instrumentation for the Agent Management System.
+Collects wall time, rows and bytes per stage of one ingest_csv call; the result
+is stored as an IngestionStat row and shown on the upload page.
+See DOCUMENTATION.txt for detailed data processing descriptions.
+"""
+
+from contextlib import contextmanager
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:  # optional: /proc/self/status is read instead (Linux)
+    psutil = None
+
+RSS_SAMPLE_SECONDS = 0.2  # resident set size sampling interval during a load
+
+
+def current_rss_mb():
+    """Current resident set size of this process in MB, or None if it cannot be read"""
+    if psutil is not None:
+        return round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+class RssSampler:
+    """
+    Peak RSS of this process while one load runs: a baseline when started, then a sample
+    every RSS_SAMPLE_SECONDS on a daemon thread until stopped. Unlike ru_maxrss it does not
+    carry the high-water mark of earlier loads in the same process.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.baseline_mb = current_rss_mb()
+        self.peak_mb = self.baseline_mb
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+        if self.baseline_mb is not None:
+            self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            self._sample()
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+
+    def peak(self):
+        """Peak in MB so far (taking one more sample while still running)"""
+        if self._thread is not None and not self._stopped.is_set():
+            self._sample()
+        return self.peak_mb
+
+    def stop(self):
+        """Stop sampling (idempotent) and return the peak in MB"""
+        if self._thread is not None and not self._stopped.is_set():
+            self._stopped.set()
+            self._thread.join()
+            self._sample()
+        return self.peak_mb
+
+
+class IngestionStats:
+    """
+    Stage timings for one ingestion. A stage recorded more than once (per chunk,
+    per thread or per worker) accumulates seconds, rows, bytes and calls, keeping
+    the order in which stages first appeared. Safe to use from several threads.
+    Used as a context manager, memory sampling stops when the block exits.
+    """
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._rss = None
+        self.worker_peak_rss_mb = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop_memory()
+        return False
+
+    def track_memory(self):
+        """Start sampling this process's RSS until stop_memory() (or the with block ends)"""
+        if self._rss is None:
+            self._rss = RssSampler()
+        return self
+
+    def stop_memory(self):
+        """Stop the RSS sampler thread (idempotent)"""
+        if self._rss is not None:
+            self._rss.stop()
+
+    @property
+    def baseline_rss_mb(self):
+        return self._rss.baseline_mb if self._rss else None
+
+    def peak_rss_mb(self):
+        """Peak RSS of this process since track_memory(), or None if not tracked"""
+        return self._rss.peak() if self._rss else None
+
+    def add_worker_peak(self, peak_mb):
+        """Fold in the peak RSS reported by a worker process (largest one wins)"""
+        if peak_mb is not None:
+            with self._lock:
+                self.worker_peak_rss_mb = max(self.worker_peak_rss_mb or 0, peak_mb)
+
+    @contextmanager
+    def stage(self, name, rows=None, nbytes=None):
+        """Time a block; rows/bytes can also be set on the yielded dict inside it"""
+        entry = {'rows': rows, 'bytes': nbytes}
+        started = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            self.add(name, time.perf_counter() - started, entry['rows'], entry['bytes'])
+
+    def add(self, name, seconds, rows=None, nbytes=None, calls=1):
+        with self._lock:
+            entry = self._stages.setdefault(name, {'seconds': 0.0, 'rows': None, 'bytes': None, 'calls': 0})
+            entry['seconds'] += seconds
+            entry['calls'] += calls
+            if rows is not None:
+                entry['rows'] = (entry['rows'] or 0) + rows
+            if nbytes is not None:
+                entry['bytes'] = (entry['bytes'] or 0) + nbytes
+
+    def timed(self, name, iterable):
+        """Yield from iterable, charging the time spent producing items (and their len) to stage `name`"""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            item = next(iterator, None)
+            if item is None:
+                self.add(name, time.perf_counter() - started, calls=0)
+                return
+            self.add(name, time.perf_counter() - started, len(item))
+            yield item
+
+    def merge(self, stages, prefix=''):
+        """Fold in another collector's as_list() (e.g. from a worker process)"""
+        for stage in stages:
+            self.add(prefix + stage['stage'], stage['seconds'], stage['rows'], stage['bytes'], stage['calls'])
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    def as_list(self):
+        with self._lock:
+            return [
+                {
+                    'stage': name,
+                    'seconds': round(entry['seconds'], 3),
+                    'rows': entry['rows'],
+                    'bytes': entry['bytes'],
+                    'calls': entry['calls'],
+                    'rows_per_sec': round(entry['rows'] / entry['seconds']) if entry['rows'] and entry['seconds'] else None,
+                }
+                for name, entry in self._stages.items()
+            ]
+
+    def summary(self):
+        """One log line per stage"""
+        return [
+            f"   ⏱ {stage['stage']}: {stage['seconds']:.2f}s"
+            + (f", {stage['rows']:,} rows" if stage['rows'] is not None else "")
+            + (f", {stage['bytes'] / (1024 * 1024):.1f} MB" if stage['bytes'] else "")
+            + (f", {stage['rows_per_sec']:,} rows/s" if stage['rows_per_sec'] else "")
+            for stage in self.as_list()
+        ]
@@ -1,68 +1,331 @@
+import bz2
+import csv
+import gzip
+import io
 import os
+import zipfile
 import pandas as pd
 from datetime import datetime
 import numpy as np
+from app.config import Config
 
-def load_raw_data(file_path):
-    """Enhanced CSV loader with memory optimization for large files"""
-    dtype_mapping = {
-        'Agent name': 'str',
-        'Profile ID': 'str',
-        'Call Log ID': 'str',
-        'Log Type': 'str',
-        'State': 'str',
-        'Call type': 'str',
-        'Original campaign': 'str',
-        'Current campaign': 'str',
-        'Ember': 'str'
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # optional: INGEST_CSV_ENGINE=pyarrow falls back to the C parser
+    pa = pa_csv = None
+
+# Few distinct values per file: read as dictionary-encoded categoricals instead of one str per row
+LOW_CARDINALITY_COLUMNS = [
+    'Agent name', 'Log Type', 'State', 'Call type',
+    'Original campaign', 'Current campaign', 'Ember'
+]
+
+REQUIRED_COLUMNS = [
+    'Agent name', 'Profile ID', 'Call Log ID', 'Log Time',
+    'Log Type', 'State', 'Call type', 'Original campaign',
+    'Current campaign', 'Ember'
+]
+
+RAW_DATA_CHUNK_ROWS = 50000       # default rows per iter_raw_data chunk
+CHUNK_SAMPLE_BYTES = 1024 * 1024  # bytes sampled to estimate the average row width
+
+# Upload formats: plain CSV, or a CSV compressed with gzip / bzip2 / zip (one CSV member)
+COMPRESSED_SUFFIXES = ('.csv.gz', '.csv.bz2', '.zip')
+CSV_SUFFIXES = ('.csv',) + COMPRESSED_SUFFIXES
+
+
+def is_compressed(file_path):
+    return file_path.lower().endswith(COMPRESSED_SUFFIXES)
+
+
+def csv_source_name(filename):
+    """Name the data is recorded under: 'export.csv.gz' / 'export.zip' -> 'export.csv'"""
+    lower = filename.lower()
+    for suffix in ('.csv.gz', '.csv.bz2'):
+        if lower.endswith(suffix):
+            return filename[:-len(suffix) + len('.csv')]
+    if lower.endswith('.zip'):
+        return filename[:-len('.zip')] + '.csv'
+    return filename
+
+
+def open_csv_stream(file_path):
+    """
+    Binary file object over the CSV content of a plain, .csv.gz, .csv.bz2 or .zip file.
+    Compressed files are inflated on the fly as the stream is read, never to disk.
+    """
+    lower = file_path.lower()
+    if lower.endswith('.gz'):
+        return gzip.open(file_path, 'rb')
+    if lower.endswith('.bz2'):
+        return bz2.open(file_path, 'rb')
+    if lower.endswith('.zip'):
+        with zipfile.ZipFile(file_path) as archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir() and info.filename.lower().endswith('.csv')
+                and not info.filename.startswith('__MACOSX/')
+            ]
+            if len(members) != 1:
+                raise ValueError(f"Zip upload must contain exactly one CSV file (found {len(members)})")
+            # The member stream keeps the archive's file handle open after the ZipFile closes
+            return archive.open(members[0])
+    return open(file_path, 'rb')
+
+
+def split_byte_ranges(file_path, parts):
+    """
+    Split a plain CSV into up to `parts` newline-aligned byte ranges of about equal size.
+    Returns (header line bytes, [(start, end), ...]); the ranges cover every data line once.
+    Assumes no line breaks inside quoted fields.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        boundaries = [data_start]
+        for part in range(1, parts):
+            f.seek(max(data_start + (size - data_start) * part // parts - 1, boundaries[-1]))
+            f.readline()  # move to the start of the next line
+            boundaries.append(min(f.tell(), size))
+        boundaries.append(size)
+
+    ranges = [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+    return header, ranges
+
+
+def ranges_start_on_rows(file_path, header, ranges):
+    """
+    True if, at every range boundary, both the line ending there and the line starting
+    there parse as complete rows with the header's field count. A quoted field with a line
+    break in it makes split_byte_ranges cut inside a row, which leaves a line with an
+    unterminated quote or the wrong number of fields on one side of the cut.
+    """
+    expected = len(_parse_line(header.decode('utf-8-sig', errors='replace')) or [])
+    with open(file_path, 'rb') as f:
+        for start, _ in ranges[1:]:
+            for line in (_line_before(f, start), _line_at(f, start)):
+                fields = _parse_line(line.decode('utf-8', errors='replace'))
+                if fields is None or len(fields) != expected:
+                    return False
+    return True
+
+
+def _parse_line(line):
+    """Fields of one CSV line, None if it is not a complete row on its own"""
+    try:
+        return next(csv.reader([line], strict=True), [])
+    except csv.Error:
+        return None
+
+
+def _line_at(f, offset):
+    f.seek(offset)
+    return f.readline()
+
+
+def _line_before(f, offset):
+    """The line that ends right before `offset` (which is a line start)"""
+    start = offset - 1
+    while start > 0:
+        window = max(start - CHUNK_SAMPLE_BYTES, 0)
+        f.seek(window)
+        newline = f.read(start - window).rfind(b'\n')
+        if newline >= 0:
+            start = window + newline + 1
+            break
+        start = window
+    f.seek(start)
+    return f.read(offset - start)
+
+
+class _ByteRangeReader(io.RawIOBase):
+    """Raw stream over the header line followed by bytes [start, end) of a file"""
+
+    def __init__(self, file_path, header, start, end):
+        self._file = open(file_path, 'rb')
+        self._file.seek(start)
+        self._prefix = header
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._prefix:
+            count = min(len(buffer), len(self._prefix))
+            buffer[:count] = self._prefix[:count]
+            self._prefix = self._prefix[count:]
+            return count
+        if self._remaining <= 0:
+            return 0
+        data = self._file.read(min(len(buffer), self._remaining))
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def open_csv_range(file_path, header, start, end):
+    """Binary stream reading one byte range of a CSV as a complete CSV (header first)"""
+    return io.BufferedReader(_ByteRangeReader(file_path, header, start, end), buffer_size=1024 * 1024)
+
+
+def csv_engine(engine=None):
+    """Reader backend: 'pyarrow' (multi-threaded, Arrow-backed) when requested and installed, else 'c'"""
+    engine = (engine or Config.INGEST_CSV_ENGINE).lower()
+    if engine == 'pyarrow' and pa_csv is None:
+        print("⚠ INGEST_CSV_ENGINE=pyarrow but pyarrow is not installed; using the C parser")
+        return 'c'
+    return 'pyarrow' if engine == 'pyarrow' else 'c'
+
+
+def csv_dtypes(columns):
+    """pandas dtypes for the C parser: categoricals for low-cardinality columns, strings otherwise"""
+    return {
+        column: 'category' if column in LOW_CARDINALITY_COLUMNS else 'string'
+        for column in columns if column != 'Log Time'
     }
+
+
+def read_csv_frame(source, columns, engine=None):
+    """Read only `columns` of a CSV (path or binary stream) into one frame"""
+    if csv_engine(engine) == 'pyarrow':
+        return pa_csv.read_csv(
+            source,
+            read_options=pa_csv.ReadOptions(use_threads=True),
+            convert_options=_arrow_convert_options(columns)
+        ).to_pandas()
+
+    return pd.read_csv(
+        source,
+        encoding="utf-8-sig",
+        usecols=columns,
+        dtype=csv_dtypes(columns),
+        low_memory=False,
+        engine='c'
+    )
+
+
+def iter_csv_frames(source, columns, chunk_rows, block_bytes, engine=None):
+    """
+    Yield frames of `columns` from a CSV (path or binary stream). The C parser yields
+    chunk_rows rows at a time; the Arrow reader yields blocks of about block_bytes.
+    """
+    if csv_engine(engine) == 'pyarrow':
+        reader = pa_csv.open_csv(
+            source,
+            read_options=pa_csv.ReadOptions(use_threads=True, block_size=int(block_bytes)),
+            convert_options=_arrow_convert_options(columns)
+        )
+        for batch in reader:
+            yield batch.to_pandas()
+        return
+
+    reader = pd.read_csv(
+        source,
+        encoding="utf-8-sig",
+        usecols=columns,
+        dtype=csv_dtypes(columns),
+        chunksize=chunk_rows,
+        engine='c'
+    )
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+
+def _arrow_convert_options(columns):
+    """Every column as text (Log Time is parsed by pandas later); low-cardinality ones dictionary-encoded"""
+    return pa_csv.ConvertOptions(
+        include_columns=list(columns),
+        column_types={
+            column: pa.dictionary(pa.int32(), pa.string()) if column in LOW_CARDINALITY_COLUMNS else pa.string()
+            for column in columns
+        },
+        strings_can_be_null=True
+    )
+
+
+def strip_values(column):
+    """
+    Strip whitespace from a text column, keeping NA as NA. Categoricals are stripped
+    per category and stay categorical (categories that collapse together are merged).
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = pd.Series(column.cat.categories).astype('string').str.strip()
+        category_codes, stripped = pd.factorize(categories)
+        codes = column.cat.codes.to_numpy()
+        present = codes >= 0
+        # Index only present codes: an all-NA column has no categories to look up
+        codes = codes.copy()
+        codes[present] = category_codes[codes[present]]
+        return pd.Categorical.from_codes(codes, categories=stripped.astype(object))
+    return column.astype('string').str.strip().to_numpy()
+
+def read_header(file_path):
+    """Column names of a CSV (plain or compressed)"""
+    with open_csv_stream(file_path) as handle:
+        return pd.read_csv(handle, nrows=0, encoding="utf-8-sig").columns
+
+
+def validate_columns(columns):
+    missing_columns = set(REQUIRED_COLUMNS) - set(columns)
+    if missing_columns:
+        raise ValueError(f"CSV missing required columns: {missing_columns}")
+
+
+def sample_row_bytes(file_path):
+    """Average CSV line width over the first CHUNK_SAMPLE_BYTES"""
+    with open_csv_stream(file_path) as f:
+        sample = f.read(CHUNK_SAMPLE_BYTES)
+    return max(len(sample) / max(sample.count(b'\n'), 1), 1)
+
+
+def clean_frame(df):
+    """
+    Strip every text column and parse Log Time, in place. Missing values stay typed
+    NULLs (pd.NA in text, NaN codes in categoricals, NaT in Log Time), never 'nan'.
+    """
+    for col in df.columns:
+        if col != 'Log Time':
+            df[col] = strip_values(df[col])
+
+    df['Log Time'] = pd.to_datetime(df['Log Time'], errors='coerce')
+    return df
+
+
+def iter_raw_data(file_path, chunk_rows=RAW_DATA_CHUNK_ROWS, columns=None, engine=None):
+    """
+    Yield validated, cleaned frames of about chunk_rows rows from a CSV export (plain or
+    compressed), reading `columns` (default: every column). Only one chunk is held at a
+    time, so memory stays bounded whatever the file size.
+    """
+    header = read_header(file_path)
+    validate_columns(header)
+    columns = list(columns or header)
+    block_bytes = chunk_rows * sample_row_bytes(file_path)
+
+    with open_csv_stream(file_path) as handle:
+        for chunk in iter_csv_frames(handle, columns, chunk_rows, block_bytes, engine):
+            yield clean_frame(chunk)
+
+
+def load_raw_data(file_path, columns=None, engine=None):
+    """
+    Whole CSV export as one validated, cleaned frame (see clean_frame). Reads the file in
+    a single pass; use iter_raw_data to process large files chunk by chunk instead.
+    """
     try:
-        # First check file size to determine optimal loading strategy
-        file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-        
-        if file_size_mb > 50:  # If file is larger than 50MB, use chunking
-            chunks = []
-            for chunk in pd.read_csv(
-                file_path,
-                dtype=dtype_mapping,
-                parse_dates=['Log Time'],
-                on_bad_lines='warn',
-                chunksize=10000,
-                low_memory=False
-            ):
-                # Clean string fields in each chunk
-                for col in chunk.select_dtypes(include=['object']):
-                    chunk[col] = chunk[col].astype(str).str.strip()
-                chunks.append(chunk)
-            
-            df = pd.concat(chunks, ignore_index=True)
-            
-        else:
-            # Load entire file for smaller files
-            df = pd.read_csv(
-                file_path,
-                dtype=dtype_mapping,
-                parse_dates=['Log Time'],
-                on_bad_lines='warn',
-                low_memory=False
-            )
-            
-            # Clean all string fields
-            for col in df.select_dtypes(include=['object']):
-                df[col] = df[col].astype(str).str.strip()
-        
-        # Validate we have the required columns
-        required_columns = [
-            'Agent name', 'Profile ID', 'Call Log ID', 'Log Time',
-            'Log Type', 'State', 'Call type', 'Original campaign',
-            'Current campaign', 'Ember'
-        ]
-        
-        missing_columns = set(required_columns) - set(df.columns)
-        if missing_columns:
-            raise ValueError(f"Missing required columns: {missing_columns}")
-            
-        return df
-    
+        header = read_header(file_path)
+        validate_columns(header)
+        with open_csv_stream(file_path) as handle:
+            df = read_csv_frame(handle, list(columns or header), engine)
+        return clean_frame(df)
+
     except Exception as e:
-        raise ValueError(f"CSV loading failed: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"CSV loading failed: {str(e)}")
@@ -169,7 +169,12 @@ class Role(db.Model):
 # ------------------------
 
 class RawCallLog(db.Model):
+    # On PostgreSQL both call-log tables are partitioned by month on log_time (app/partitions.py)
     __tablename__ = 'raw_call_logs'
+    __table_args__ = (
+        # Row dedup key for INSERT ... ON CONFLICT DO NOTHING during ingestion
+        db.Index('ux_raw_call_logs_call_key', 'call_log_id', 'log_time', 'log_type', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     agent_name = db.Column(db.String(100))
@@ -183,10 +188,16 @@ class RawCallLog(db.Model):
     current_campaign = db.Column(db.String(100))
     ember = db.Column(db.String(50))
     source_file = db.Column(db.String(255))
+    batch_id = db.Column(db.Integer, index=True)  # UploadBatch that loaded the row (NULL: loaded before batches)
     uploaded_at = db.Column(db.DateTime, server_default=db.func.now())
 
 class UpdatedCallLog(db.Model):
     __tablename__ = 'updated_call_logs'
+    __table_args__ = (
+        # Latest-row-per-agent lookups during ingestion (see DataIngestionManager)
+        db.Index('ix_updated_call_logs_agent_log_time', 'agent_name', 'log_time'),
+        db.Index('ux_updated_call_logs_call_key', 'call_log_id', 'log_time', 'log_type', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     agent_name = db.Column(db.String(100))
@@ -206,6 +217,7 @@ class UpdatedCallLog(db.Model):
     tm_name = db.Column(db.String(100))
     tl_name = db.Column(db.String(100))
     source_file = db.Column(db.String(255))
+    batch_id = db.Column(db.Integer, index=True)  # UploadBatch that loaded the row (NULL: loaded before batches)
     updated_at = db.Column(db.DateTime, server_default=db.func.now())
     status = db.Column(
     db.String(50),
@@ -322,3 +334,114 @@ class AgentInfo(db.Model):
 
     def __repr__(self):
         return f"<AgentInfo {self.agent_name}>"
+
+
+# ------------------------
+# Upload Fingerprint
+# ------------------------
+
+class UploadFingerprint(db.Model):
+    """Content hash + date range of each ingested file, used to detect re-uploads"""
+    __tablename__ = 'upload_fingerprints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)
+    source_file = db.Column(db.String(255), nullable=False, index=True)
+    min_log_time = db.Column(db.DateTime, nullable=True)
+    max_log_time = db.Column(db.DateTime, nullable=True)
+    row_count = db.Column(db.Integer, default=0)
+    skipped_rows = db.Column(db.Integer, default=0)
+    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<UploadFingerprint {self.source_file} {self.content_hash[:12]}>"
+
+
+class UploadBatch(db.Model):
+    """
+    One load of a file. Its id is stamped on every raw/updated row it writes, and it turns
+    'published' in the same transaction that makes those rows visible. Together with its
+    UploadBatchDate rows it is the upload catalog behind the file and date pickers.
+    """
+    __tablename__ = 'upload_batches'
+
+    id = db.Column(db.Integer, primary_key=True)
+    source_file = db.Column(db.String(255), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='loading', index=True)  # loading / published / failed
+    rows = db.Column(db.Integer, default=0)
+    min_log_time = db.Column(db.DateTime, nullable=True)
+    max_log_time = db.Column(db.DateTime, nullable=True)
+    uploaded_by = db.Column(db.String(80))
+    overlapping_files = db.Column(db.Text)  # comma-separated files whose Log Time range this load overlapped
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    published_at = db.Column(db.DateTime, nullable=True)
+
+    dates = db.relationship('UploadBatchDate', backref='batch', lazy=True, passive_deletes=True)
+
+    def __repr__(self):
+        return f"<UploadBatch {self.id} {self.source_file} {self.status}>"
+
+
+class UploadBatchDate(db.Model):
+    """Rows an upload batch holds per Log Time date; kept in step with deletes"""
+    __tablename__ = 'upload_batch_dates'
+
+    batch_id = db.Column(db.Integer, db.ForeignKey('upload_batches.id', ondelete='CASCADE'), primary_key=True)
+    log_date = db.Column(db.Date, primary_key=True)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<UploadBatchDate {self.batch_id} {self.log_date} {self.rows}>"
+
+
+class UploadJob(db.Model):
+    """
+    Persistent state of a background ingestion job, so any web process can report its
+    progress and jobs lost to a restart can be detected
+    """
+    __tablename__ = 'upload_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid hex, the ingestion_id polled by the browser
+    filename = db.Column(db.String(255), nullable=False)
+    path = db.Column(db.String(512))  # temp upload file, removed when the job ends
+    username = db.Column(db.String(80))
+    owner = db.Column(db.String(64), index=True)  # token of the process running the job
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued / running / completed / failed
+    stage = db.Column(db.String(100))
+    message = db.Column(db.Text)
+    rows_processed = db.Column(db.BigInteger, default=0)
+    total_rows = db.Column(db.BigInteger)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<UploadJob {self.id} {self.filename} {self.status}>"
+
+
+class IngestionStat(db.Model):
+    """Per-upload ingestion statistics: totals plus a JSON list of per-stage timings"""
+    __tablename__ = 'ingestion_stats'
+
+    id = db.Column(db.Integer, primary_key=True)
+    source_file = db.Column(db.String(255), nullable=False, index=True)
+    mode = db.Column(db.String(20))  # in-memory / streaming / parallel / sql
+    status = db.Column(db.String(20), default='completed')  # completed / failed
+    rows = db.Column(db.Integer, default=0)
+    skipped_rows = db.Column(db.Integer, default=0)
+    file_bytes = db.Column(db.BigInteger)
+    total_seconds = db.Column(db.Float)
+    rows_per_sec = db.Column(db.Float)
+    baseline_rss_mb = db.Column(db.Float)  # RSS when the load started
+    peak_rss_mb = db.Column(db.Float)  # sampled peak RSS of the serving process during the load
+    worker_peak_rss_mb = db.Column(db.Float)  # largest peak among parallel worker processes
+    stages = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    @property
+    def slowest_stage(self):
+        return max(self.stages or [], key=lambda stage: stage['seconds'], default=None)
+
+    def __repr__(self):
+        return f"<IngestionStat {self.source_file} {self.rows} rows {self.total_seconds}s>"
@@ -0,0 +1,281 @@
+"""
+Monthly log_time partitioning of the call-log tables for the Agent Management System.
+raw_call_logs and updated_call_logs are RANGE-partitioned on log_time with one partition
+per month plus a default partition (rows without a Log Time). Ingestion creates the months
+it is about to load; retention detaches whole months instead of deleting rows.
+See DOCUMENTATION.txt for detailed data processing descriptions.
+"""
+
+from datetime import datetime
+import re
+import pandas as pd
+from sqlalchemy import text
+from app import db
+from app.config import Config
+
+PARTITIONED_TABLES = ('raw_call_logs', 'updated_call_logs')
+PARTITION_LOCK_NAMESPACE = 20482  # pg_advisory_xact_lock(namespace, hashtext(table)) while adding months
+UNPARTITIONED_SUFFIX = '_unpartitioned'
+DETACHED_SUFFIX = '_detached'
+MONTH_SUFFIX = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def month_start(value):
+    value = pd.Timestamp(value)
+    return datetime(value.year, value.month, 1)
+
+
+def next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def months_between(min_time, max_time):
+    """First day of every month from min_time's to max_time's, inclusive"""
+    if pd.isnull(min_time) or pd.isnull(max_time):
+        return []
+    month, last = month_start(min_time), month_start(max_time)
+    months = []
+    while month <= last:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def partitioning_enabled():
+    return Config.CALL_LOG_PARTITIONING and db.engine.dialect.name == 'postgresql'
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def _relation_exists(cursor, name):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+    return cursor.fetchone()[0]
+
+
+# -------------------- Ingestion --------------------
+def ensure_partitions(min_time, max_time, cursor=None):
+    """
+    Create the monthly partitions covering [min_time, max_time] on both tables.
+    Runs on its own short transaction, or inside the caller's when a cursor is given.
+    A no-op while the tables are not partitioned. Returns the partitions created.
+    """
+    if not partitioning_enabled() or not months_between(min_time, max_time):
+        return []
+    if cursor is not None:
+        return _add_months(cursor, min_time, max_time)
+
+    raw_conn = db.engine.raw_connection()
+    try:
+        with raw_conn.cursor() as own_cursor:
+            created = _add_months(own_cursor, min_time, max_time)
+        raw_conn.commit()
+    finally:
+        raw_conn.close()
+    return created
+
+
+def _add_months(cursor, min_time, max_time):
+    created = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(cursor, table):
+            continue
+        missing = [
+            month for month in months_between(min_time, max_time)
+            if not _relation_exists(cursor, partition_name(table, month))
+        ]
+        if not missing:
+            continue
+        # Two loads reaching a new month at once: the second finds it created
+        cursor.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", (PARTITION_LOCK_NAMESPACE, table))
+        for month in missing:
+            if not _relation_exists(cursor, partition_name(table, month)):
+                _attach_month(cursor, table, month)
+                created.append(partition_name(table, month))
+    return created
+
+
+def _attach_month(cursor, table, month):
+    """
+    Build the month as a plain table and ATTACH it, which only takes SHARE UPDATE EXCLUSIVE
+    on the parent (CREATE TABLE ... PARTITION OF would lock out every reader). Rows that
+    landed in the default partition before the month existed move into it first.
+    """
+    name = partition_name(table, month)
+    start, end = f"'{month:%Y-%m-%d}'", f"'{next_month(month):%Y-%m-%d}'"
+    cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+
+    default = default_partition_name(table)
+    if _relation_exists(cursor, default):
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM {default} WHERE log_time >= {start} AND log_time < {end} RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """)
+        if cursor.rowcount:
+            print(f"🔀 Moved {cursor.rowcount:,} rows from {default} into {name}")
+
+    cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({start}) TO ({end})")
+    print(f"✅ Partition {name} created")
+
+
+# -------------------- Migration --------------------
+def partition_table(cursor, table):
+    """
+    Convert a plain call-log table into a partitioned one inside the caller's transaction:
+    the old table is renamed, a partitioned parent with the same columns, defaults, indexes
+    and id sequence takes its name, one partition per month of existing data plus a default
+    partition are created, the rows are copied over and the old table is dropped.
+    Holds ACCESS EXCLUSIVE on the table until the transaction commits. Returns rows copied.
+    """
+    legacy = f"{table}{UNPARTITIONED_SUFFIX}"
+    cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+    cursor.execute(
+        "SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid), indisprimary "
+        "FROM pg_index WHERE indrelid = %s::regclass", (table,)
+    )
+    indexes = cursor.fetchall()
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,))
+    sequence = cursor.fetchone()[0]
+    cursor.execute(f"SELECT min(log_time), max(log_time) FROM {table}")
+    min_time, max_time = cursor.fetchone()
+
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    for name, _, _ in indexes:
+        cursor.execute(f"ALTER INDEX {name} RENAME TO {name}{UNPARTITIONED_SUFFIX}")
+
+    cursor.execute(
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) "
+        f"PARTITION BY RANGE (log_time)"
+    )
+    if sequence:
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+    cursor.execute(f"CREATE TABLE {default_partition_name(table)} PARTITION OF {table} DEFAULT")
+    for month in months_between(min_time, max_time):
+        cursor.execute(
+            f"CREATE TABLE {partition_name(table, month)} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month(month):%Y-%m-%d}')"
+        )
+
+    cursor.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+    rows = cursor.rowcount
+
+    # Indexes are built after the copy; unique keys must include log_time on a partitioned table.
+    # The primary key becomes unique (id, log_time): a PRIMARY KEY would make log_time NOT NULL,
+    # and rows without a Log Time belong in the default partition
+    for name, definition, primary in indexes:
+        if primary:
+            cursor.execute(f"CREATE UNIQUE INDEX {table}_pkey ON {table} (id, log_time)")
+            continue
+        cursor.execute("SAVEPOINT partition_index")
+        try:
+            cursor.execute(definition)
+            cursor.execute("RELEASE SAVEPOINT partition_index")
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT partition_index")
+            cursor.execute(definition.replace("CREATE UNIQUE INDEX", "CREATE INDEX", 1))
+            print(f"⚠ {name} recreated as a non-unique index: {e}")
+
+    cursor.execute(f"DROP TABLE {legacy}")
+    cursor.execute(f"ANALYZE {table}")
+    print(f"✅ {table} partitioned by month ({rows:,} rows copied)")
+    return rows
+
+
+def partition_empty_tables():
+    """Partition call-log tables that are still plain and empty (new installs) at app start"""
+    if not partitioning_enabled():
+        return
+    raw_conn = db.engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cursor:
+            for table in PARTITIONED_TABLES:
+                if not _relation_exists(cursor, table) or is_partitioned(cursor, table):
+                    continue
+                cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+                if cursor.fetchone()[0]:
+                    print(f"ℹ {table} holds data and is not partitioned; run `flask partitions migrate`")
+                    continue
+                partition_table(cursor, table)
+        raw_conn.commit()
+    finally:
+        raw_conn.close()
+
+
+# -------------------- Retention --------------------
+def list_month_partitions(cursor, table):
+    """(month, partition name) of every monthly partition attached to table, oldest first"""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = %s::regclass", (table,)
+    )
+    months = []
+    for (name,) in cursor.fetchall():
+        match = MONTH_SUFFIX.search(name)
+        if match:
+            months.append((datetime(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(months)
+
+
+def detach_months_before(cutoff, drop=True):
+    """
+    Retention: detach every monthly partition that ends on or before cutoff's month from both
+    tables, then drop it (or keep it as <name>_detached for archiving). Upload fingerprints of
+    files that are no longer fully loaded are removed so they can be uploaded again, and upload
+    batches whose rows all lay in the detached months are removed too; the catalog of the
+    others loses the detached dates.
+    Returns the partitions detached.
+    """
+    from app.models import UploadFingerprint, UploadBatch
+
+    cutoff = month_start(cutoff)
+    detached = []
+    raw_conn = db.engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cursor:
+            for table in PARTITIONED_TABLES:
+                if not is_partitioned(cursor, table):
+                    continue
+                for month, name in list_month_partitions(cursor, table):
+                    if next_month(month) > cutoff:
+                        continue
+                    cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                    if drop:
+                        cursor.execute(f"DROP TABLE {name}")
+                    else:
+                        cursor.execute(f"ALTER TABLE {name} RENAME TO {name}{DETACHED_SUFFIX}")
+                    detached.append(name)
+        raw_conn.commit()
+    finally:
+        raw_conn.close()
+
+    if detached:
+        try:
+            UploadFingerprint.query.filter(UploadFingerprint.min_log_time < cutoff).delete(synchronize_session=False)
+            UploadBatch.query.filter(UploadBatch.max_log_time < cutoff).delete(synchronize_session=False)
+            db.session.execute(text("""
+                WITH gone AS (
+                    DELETE FROM upload_batch_dates WHERE log_date < :cutoff RETURNING batch_id, rows
+                )
+                UPDATE upload_batches b SET rows = greatest(b.rows - g.rows, 0),
+                       min_log_time = greatest(b.min_log_time, :cutoff)
+                FROM (SELECT batch_id, sum(rows) AS rows FROM gone GROUP BY batch_id) g
+                WHERE b.id = g.batch_id
+            """), {'cutoff': cutoff})
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠ Could not clear fingerprints and batches of detached months: {e}")
+    return detached
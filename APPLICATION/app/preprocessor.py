@@ -1,15 +1,10 @@
 import pandas as pd
 from app import db
 from app.models import RawCallLog, UpdatedCallLog
+from app.utils import normalize_agent_names
 
 DEFAULT_DESIGNATION = "Agent"
 
-def clean_agent_name(name: str) -> str:
-    return name.replace("-P", "").strip()
-
-def detect_role(name: str) -> str:
-    return "Part timer" if "-P" in name else "Full timer"
-
 def process_dataframe(df: pd.DataFrame, source_filename: str):
     """Process a single raw dataframe and insert directly into DB"""
     
@@ -17,9 +12,8 @@ def process_dataframe(df: pd.DataFrame, source_filename: str):
         print(f"[Processor] ❌ Skipped '{source_filename}' (missing columns)")
         return
     
-    df['Agent name'] = df['Agent name'].astype(str)
-    df['Role'] = df['Agent name'].apply(detect_role)
-    df['Agent name'] = df['Agent name'].apply(clean_agent_name)
+    # Same names/roles as ingestion stores, cleaned once per distinct name
+    df['Agent name'], df['Role'] = normalize_agent_names(df['Agent name'])
     df['Designation'] = DEFAULT_DESIGNATION
     df['Group Name'] = ''
     df['TM Name'] = ''
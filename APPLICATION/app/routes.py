@@ -364,7 +364,9 @@ def upload():
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return jsonify({
             'success': success,
-            'message': result.get('message', 'File processed successfully' if success else 'File processing failed')
+            'message': result.get('message', 'File processed successfully' if success else 'File processing failed'),
+            'ingestion_id': result.get('ingestion_id'),
+            'queued': result.get('queued', False)
         })
     
     flash(result['message'], 'success' if success else 'error')
@@ -374,13 +376,9 @@ def upload():
 @login_required
 def upload_progress(ingestion_id):
     """Endpoint to get real-time ingestion progress"""
-    progress_data = {
-        'current_step': 'Processing data',
-        'progress': 50,
-        'message': 'Inserting records into database...',
-        'rows_processed': 22500,
-        'total_rows': 45000
-    }
+    progress_data = file_service.get_ingestion_progress(ingestion_id)
+    if progress_data is None:
+        return jsonify({'success': False, 'message': 'Unknown ingestion id'}), 404
     return jsonify(progress_data)
 
 # ==================== OTHER ROUTES ==================== #
@@ -434,28 +432,8 @@ def approve_delete(req_id):
     req = DeleteRequest.query.get_or_404(req_id)
     
     try:
-        if req.date_range:
-            dates = req.date_range.split(',')
-            for date_str in dates:
-                # REPLACED: pd.to_datetime with datetime.strptime
-                date_start = datetime.strptime(date_str, "%Y-%m-%d")
-                # REPLACED: pd.Timedelta with timedelta
-                date_end = date_start + timedelta(days=1)
-
-                db.session.query(RawCallLog).filter(
-                    RawCallLog.source_file == req.filename,
-                    RawCallLog.log_time >= date_start,
-                    RawCallLog.log_time < date_end
-                ).delete(synchronize_session=False)
-
-                db.session.query(UpdatedCallLog).filter(
-                    UpdatedCallLog.source_file == req.filename,
-                    UpdatedCallLog.log_time >= date_start,
-                    UpdatedCallLog.log_time < date_end
-                ).delete(synchronize_session=False)
-        else:
-            db.session.query(RawCallLog).filter(RawCallLog.source_file == req.filename).delete(synchronize_session=False)
-            db.session.query(UpdatedCallLog).filter(UpdatedCallLog.source_file == req.filename).delete(synchronize_session=False)
+        # Range-bounded deletes (partition pruning); deleted content may be uploaded again
+        file_service.delete_file_rows(req.filename, req.date_range.split(',') if req.date_range else None)
 
         req.status = 'approved'
         req.processed_by = current_user.username
@@ -1,6 +1,7 @@
 from .distribution_service import DistributionService
 from .file_service import FileService
+from .ingestion_job_service import IngestionJobService
 from .log_service import LogService
 from .user_service import UserService
 
-__all__ = ['DistributionService', 'FileService', 'LogService', 'UserService']
\ No newline at end of file
+__all__ = ['DistributionService', 'FileService', 'IngestionJobService', 'LogService', 'UserService']
@@ -3,20 +3,26 @@ File management service for the Agent Management System.
 See DOCUMENTATION.txt for detailed service descriptions.
 """
 
-from datetime import datetime
+from datetime import datetime, time
 import os
+import uuid
 import pandas as pd
+from flask import current_app
 from werkzeug.utils import secure_filename
 from app import db
-from app.models import DeleteRequest, ActivityLog, RawCallLog, UpdatedCallLog
-from app.data_ingestion import DataIngestionManager
-from app.loader import load_raw_data
+from app.config import Config
+from app.models import DeleteRequest, ActivityLog, RawCallLog, UpdatedCallLog, UploadFingerprint, IngestionStat, UploadBatch, UploadBatchDate
+from app.data_ingestion import DataIngestionManager, MissingDedupKeyError
+from app.indexes import missing_dedup_keys
+from app.loader import load_raw_data, csv_source_name, CSV_SUFFIXES
+from app.services.ingestion_job_service import IngestionJobService
 
 class FileService:
     """Service layer for file operations"""
     
     def __init__(self):
         self.ingestion_manager = DataIngestionManager()
+        self.ingestion_jobs = IngestionJobService(self.ingestion_manager)
     
     def prepare_index_context(self, current_user):
         """Prepare context for index page"""
@@ -29,7 +35,8 @@ class FileService:
             'roles': self._get_roles(),
             'teamManagers': self._get_team_managers(),
             'teamLeaders': self._get_team_leaders(),
-            'agents': self._get_agents()
+            'agents': self._get_agents(),
+            'ingestion_stats': self._get_recent_ingestion_stats()
         }
         
         # Add legacy names for backward compatibility
@@ -46,41 +53,53 @@ class FileService:
                 return False, {'message': '❌ No file selected.', 'filename': ''}
             
             if not self._allowed_file(file.filename):
-                return False, {'message': '❌ Only CSV files are allowed.', 'filename': ''}
+                return False, {'message': '❌ Only CSV files (.csv, .csv.gz, .csv.bz2, .zip) are allowed.', 'filename': ''}
             
-            filename = secure_filename(file.filename)
-            path = os.path.join('temp_uploads', filename)
-            os.makedirs('temp_uploads', exist_ok=True)
+            upload_name = secure_filename(file.filename)
+            # Compressed uploads are recorded under their CSV name
+            filename = csv_source_name(upload_name)
+            # Unique temp name so concurrent uploads of the same file don't collide
+            path = os.path.join(Config.UPLOAD_TEMP_DIR, f"{uuid.uuid4().hex}_{upload_name}")
+            os.makedirs(Config.UPLOAD_TEMP_DIR, exist_ok=True)
             file.save(path)
             
             try:
-                # Extract date range
-                date_range = self._extract_date_range_from_file(path)
+                # Overlapping rows are only skipped through the dedup key: refuse up front
+                # rather than queue a job that would fail
+                if Config.INGEST_DEDUP_ROWS:
+                    missing = missing_dedup_keys()
+                    if missing:
+                        os.remove(path)
+                        return False, {'message': f'❌ {MissingDedupKeyError(missing)}', 'filename': filename}
                 
                 # Log upload activity
                 self._log_activity(current_user.username, f"uploaded file '{filename}'")
                 
-                # Ingest data
-                success = self.ingestion_manager.ingest_csv(path, filename, date_range)
-                
-                if success:
-                    return True, {
-                        'message': f' File "{filename}" uploaded and ingested.',
-                        'filename': filename,
-                        'ingestion_id': f"ingest-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-                    }
-                else:
-                    return False, {
-                        'message': f'❌ Failed to ingest file "{filename}"',
-                        'filename': filename
-                    }
-                        
-            finally:
-                os.remove(path)
+                # Queue ingestion; the job fingerprints the file (identical re-uploads fail
+                # it with DuplicateUploadError), reports files whose dates the loaded rows
+                # overlap and removes the temp file when done
+                job = self.ingestion_jobs.submit(
+                    current_app._get_current_object(), path, filename, current_user.username
+                )
+            except Exception:
+                if os.path.exists(path):
+                    os.remove(path)
+                raise
+            
+            return True, {
+                'message': f'⏳ File "{filename}" uploaded and queued for ingestion.',
+                'filename': filename,
+                'ingestion_id': job.id,
+                'queued': True
+            }
                 
         except Exception as e:
             return False, {'message': f'❌ Failed to process file: {str(e)}', 'filename': filename}
     
+    def get_ingestion_progress(self, ingestion_id):
+        """Progress of a queued/running ingestion job, or None if unknown"""
+        return self.ingestion_jobs.progress(ingestion_id)
+    
     def create_delete_request(self, filename, delete_option, reason, selected_dates, current_user):
         """Create deletion request"""
         try:
@@ -113,8 +132,7 @@ class FileService:
             if not current_user.has_role('admin'):
                 return False, "❌ Unauthorized"
             
-            db.session.query(RawCallLog).filter(RawCallLog.source_file == filename).delete(synchronize_session=False)
-            db.session.query(UpdatedCallLog).filter(UpdatedCallLog.source_file == filename).delete(synchronize_session=False)
+            self.delete_file_rows(filename)
             db.session.commit()
             
             self._log_activity(current_user.username, f"Deleted all data from '{filename}'")
@@ -133,22 +151,7 @@ class FileService:
             if not selected_dates:
                 return False, "⚠️ No dates selected."
             
-            for date_str in selected_dates:
-                date_start = pd.to_datetime(date_str)
-                date_end = date_start + pd.Timedelta(days=1)
-
-                db.session.query(RawCallLog).filter(
-                    RawCallLog.source_file == filename,
-                    RawCallLog.log_time >= date_start,
-                    RawCallLog.log_time < date_end
-                ).delete(synchronize_session=False)
-
-                db.session.query(UpdatedCallLog).filter(
-                    UpdatedCallLog.source_file == filename,
-                    UpdatedCallLog.log_time >= date_start,
-                    UpdatedCallLog.log_time < date_end
-                ).delete(synchronize_session=False)
-
+            self.delete_file_rows(filename, selected_dates)
             db.session.commit()
             
             self._log_activity(current_user.username, f"Deleted dates {', '.join(selected_dates)} from '{filename}'")
@@ -158,46 +161,151 @@ class FileService:
             db.session.rollback()
             return False, f"❌ Failed to delete: {str(e)}"
     
+    def delete_file_rows(self, filename, dates=None):
+        """
+        Delete a file's rows (all, or only the given 'YYYY-MM-DD' dates) from both call-log
+        tables and drop its upload fingerprint so it can be uploaded again; the caller commits.
+        Rows are found through the integer batch_id index of the file's upload batches, and
+        every DELETE carries a log_time range, so on partitioned tables only the months
+        touched are scanned. Rows loaded before upload batches existed are matched by
+        source_file alone, without the file's time range.
+        """
+        batch_ids = self._file_batch_ids(filename)
+        legacy = self._has_unbatched_rows(filename)
+        if dates:
+            days = sorted({pd.Timestamp(date_str).normalize() for date_str in dates})
+            # Consecutive days are deleted as one range
+            ranges = []
+            for day in days:
+                if ranges and ranges[-1][1] == day:
+                    ranges[-1][1] = day + pd.Timedelta(days=1)
+                else:
+                    ranges.append([day, day + pd.Timedelta(days=1)])
+        else:
+            ranges = [self._file_time_range(filename)]
+
+        for model in (RawCallLog, UpdatedCallLog):
+            if batch_ids:
+                for start, end in ranges:
+                    query = db.session.query(model).filter(model.batch_id.in_(batch_ids))
+                    if dates:
+                        query = query.filter(model.log_time >= start, model.log_time < end)
+                    elif start is not None:
+                        # Whole file: its loaded time span, plus rows stored without a Log Time
+                        query = query.filter(db.or_(model.log_time.between(start, end), model.log_time.is_(None)))
+                    query.delete(synchronize_session=False)
+            if legacy:
+                # Unbatched rows may predate the fingerprint and batches, so their time
+                # range says nothing about them: a whole-file delete takes all of them
+                query = db.session.query(model).filter(model.batch_id.is_(None), model.source_file == filename)
+                if dates:
+                    query = query.filter(db.or_(*(
+                        db.and_(model.log_time >= start, model.log_time < end) for start, end in ranges
+                    )))
+                query.delete(synchronize_session=False)
+
+        if not dates and batch_ids:
+            # Catalog: the batches go, their date rows cascade
+            db.session.query(UploadBatch).filter(UploadBatch.id.in_(batch_ids)).delete(synchronize_session=False)
+        elif batch_ids:
+            self._uncatalog_dates(batch_ids, days)
+        # The file's content is no longer fully loaded, so allow it to be re-uploaded
+        db.session.query(UploadFingerprint).filter(UploadFingerprint.source_file == filename).delete(synchronize_session=False)
+
     def get_raw_dates(self, filename):
-        """Get dates for a filename"""
-        query = db.session.query(db.func.date(RawCallLog.log_time))
+        """Get dates for a filename, from the upload catalog"""
+        query = db.session.query(UploadBatchDate.log_date).join(UploadBatch).filter(UploadBatch.status == 'published')
         if filename:
-            query = query.filter(RawCallLog.source_file == filename)
-        raw_dates = query.distinct().all()
-        return sorted({r[0].strftime('%Y-%m-%d') for r in raw_dates if r[0]})
+            query = query.filter(UploadBatch.source_file == filename)
+        dates = {r[0] for r in query.distinct().all()}
+
+        # Rows loaded before upload batches are not cataloged yet; none of their dates are
+        # bounded by the file's batches
+        if self._has_unbatched_rows(filename):
+            legacy = db.session.query(db.func.date(RawCallLog.log_time)).filter(RawCallLog.batch_id.is_(None))
+            if filename:
+                legacy = legacy.filter(RawCallLog.source_file == filename)
+            dates |= {r[0] for r in legacy.distinct().all()}
+        return sorted({d.strftime('%Y-%m-%d') for d in dates if d})
     
     # ========== PRIVATE METHODS ==========
     
     def _allowed_file(self, filename):
-        return '.' in filename and filename.rsplit('.', 1)[1].lower() == 'csv'
+        return filename.lower().endswith(CSV_SUFFIXES)
     
-    def _extract_date_range_from_file(self, file_path):
-        """Extract date range from CSV file"""
-        try:
-            df = pd.read_csv(file_path, nrows=1000, 
-                           usecols=['Log Time'] if 'Log Time' in pd.read_csv(file_path, nrows=1).columns else None)
-            
-            if 'Log Time' in df.columns:
-                df['Log Time'] = pd.to_datetime(df['Log Time'], errors='coerce')
-                valid_dates = df['Log Time'].dropna()
-                
-                if not valid_dates.empty:
-                    min_date = valid_dates.min()
-                    max_date = valid_dates.max()
-                    return (min_date, max_date)
-                    
-        except Exception as e:
-            print(f"❌ Error extracting date range: {e}")
-        
-        return (None, None)
+    def _file_time_range(self, filename):
+        """(min, max) log_time of every recorded upload of filename, or (None, None) if unknown"""
+        bounds = [
+            db.session.query(db.func.min(model.min_log_time), db.func.max(model.max_log_time))
+            .filter(model.source_file == filename).one()
+            for model in (UploadBatch, UploadFingerprint)
+        ]
+        starts = [start for start, end in bounds if start is not None and end is not None]
+        ends = [end for start, end in bounds if start is not None and end is not None]
+        return (min(starts), max(ends)) if starts else (None, None)
+
+    def _file_batch_ids(self, filename):
+        """Ids of the finished (published or failed) upload batches of filename"""
+        batches = db.session.query(UploadBatch.id).filter(
+            UploadBatch.source_file == filename, UploadBatch.status != 'loading'
+        ).all()
+        return [b[0] for b in batches]
+
+    def _uncatalog_dates(self, batch_ids, days):
+        """
+        Drop deleted days from the catalog, in the caller's transaction: batch rows and
+        Log Time ranges shrink to what is left, and batches left without rows are removed
+        """
+        dates = [day.date() for day in days]
+        removed = db.session.query(UploadBatchDate.batch_id, db.func.sum(UploadBatchDate.rows)).filter(
+            UploadBatchDate.batch_id.in_(batch_ids), UploadBatchDate.log_date.in_(dates)
+        ).group_by(UploadBatchDate.batch_id).all()
+        for batch_id, rows in removed:
+            db.session.query(UploadBatch).filter(UploadBatch.id == batch_id).update(
+                {UploadBatch.rows: db.func.greatest(UploadBatch.rows - rows, 0)}, synchronize_session=False
+            )
+        db.session.query(UploadBatchDate).filter(
+            UploadBatchDate.batch_id.in_(batch_ids), UploadBatchDate.log_date.in_(dates)
+        ).delete(synchronize_session=False)
+
+        # Narrow each batch's Log Time range to the dates it still holds (None if only
+        # rows without a Log Time are left)
+        for batch_id, _ in removed:
+            first, last = db.session.query(
+                db.func.min(UploadBatchDate.log_date), db.func.max(UploadBatchDate.log_date)
+            ).filter(UploadBatchDate.batch_id == batch_id).one()
+            if first is None:
+                bounds = {UploadBatch.min_log_time: None, UploadBatch.max_log_time: None}
+            else:
+                bounds = {
+                    UploadBatch.min_log_time: db.func.greatest(UploadBatch.min_log_time, datetime.combine(first, time.min)),
+                    UploadBatch.max_log_time: db.func.least(UploadBatch.max_log_time, datetime.combine(last, time.max))
+                }
+            db.session.query(UploadBatch).filter(UploadBatch.id == batch_id).update(bounds, synchronize_session=False)
+
+        db.session.query(UploadBatch).filter(UploadBatch.id.in_(batch_ids), UploadBatch.rows == 0).delete(
+            synchronize_session=False
+        )
+
+    def _has_unbatched_rows(self, filename=None):
+        """Whether any raw rows (of filename, if given) predate upload batches (answered from the batch_id index)"""
+        query = db.session.query(RawCallLog.id).filter(RawCallLog.batch_id.is_(None))
+        if filename:
+            query = query.filter(RawCallLog.source_file == filename)
+        return db.session.query(query.exists()).scalar()
     
     def _get_all_agent_names(self):
         agents = db.session.query(UpdatedCallLog.agent_name).distinct().all()
         return sorted([a[0] for a in agents if a[0]])
     
     def _get_all_filenames(self):
-        filenames = db.session.query(RawCallLog.source_file).distinct().all()
-        return sorted([f[0] for f in filenames if f[0]])
+        filenames = db.session.query(UploadBatch.source_file).filter(UploadBatch.status == 'published').distinct().all()
+        if self._has_unbatched_rows():
+            filenames += db.session.query(RawCallLog.source_file).filter(RawCallLog.batch_id.is_(None)).distinct().all()
+        return sorted({f[0] for f in filenames if f[0]})
+    
+    def _get_recent_ingestion_stats(self, limit=10):
+        return IngestionStat.query.order_by(IngestionStat.created_at.desc()).limit(limit).all()
     
     def _get_pending_delete_requests(self):
         return DeleteRequest.query.filter_by(status='pending').order_by(DeleteRequest.created_at.desc()).all()
@@ -0,0 +1,393 @@
+"""
+Background ingestion jobs for the Agent Management System.
+Uploads are queued to a worker pool and report progress while they run. Job state is
+mirrored to the upload_jobs table, so any web process can answer a progress poll and
+jobs lost to a restart are marked failed.
+See DOCUMENTATION.txt for detailed service descriptions.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import os
+import threading
+import time
+import uuid
+from sqlalchemy import text
+from app import db
+from app.config import Config
+from app.data_ingestion import DuplicateUploadError
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+FINISHED_JOB_LIMIT = 100
+FINISHED_JOB_RETENTION_DAYS = 7
+PROGRESS_WRITE_INTERVAL = 1.0  # seconds between progress writes to upload_jobs
+JOB_OWNER_LOCK_NAMESPACE = 20483  # pg_advisory_lock(namespace, hashtext(owner)) held by a live job process
+
+# This process's owner token and the connection holding its session advisory lock for the
+# life of the process (re-created after a fork, so forked web workers never share one)
+_owner = {'pid': None, 'token': None, 'connection': None}
+_owner_lock_guard = threading.Lock()
+
+
+class OwnerLockLostError(RuntimeError):
+    """Raised when a job's owner token is no longer locked by this process"""
+
+
+class IngestionJob:
+    """State of one queued/running ingestion, updated by the ingest progress callback"""
+
+    def __init__(self, filename, path, username):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.path = path
+        self.username = username
+        self.status = JOB_QUEUED
+        self.stage = 'Queued'
+        self.message = f'Waiting to ingest {filename}...'
+        self.rows_processed = 0
+        self.total_rows = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.owner = None
+        self._engine = None  # bound at submit: progress also arrives from pipeline threads without an app context
+        self._lock = threading.Lock()
+        self._persisted_at = 0.0
+
+    @classmethod
+    def from_record(cls, record):
+        """Read-only view of a job run by another process"""
+        job = cls(record.filename, record.path, record.username)
+        for field in ('id', 'status', 'stage', 'message', 'rows_processed', 'total_rows',
+                      'created_at', 'started_at', 'finished_at'):
+            setattr(job, field, getattr(record, field))
+        job.rows_processed = job.rows_processed or 0
+        return job
+
+    def update(self, stage, rows=None, total=None):
+        """Progress callback passed to DataIngestionManager.ingest_csv"""
+        with self._lock:
+            self.stage = stage
+            if rows is not None:
+                self.rows_processed = rows
+            if total is not None:
+                self.total_rows = total
+            self.message = f'{stage}...'
+            due = time.monotonic() - self._persisted_at >= PROGRESS_WRITE_INTERVAL
+        if due:
+            self.persist()
+
+    def start(self):
+        with self._lock:
+            self.status = JOB_RUNNING
+            self.started_at = datetime.utcnow()
+        self.persist()
+
+    def finish(self, success, message):
+        with self._lock:
+            self.status = JOB_COMPLETED if success else JOB_FAILED
+            self.stage = 'Completed' if success else 'Failed'
+            self.message = message
+            self.finished_at = datetime.utcnow()
+        self.persist()
+
+    def persist(self, insert=False):
+        """
+        Write this job's state to upload_jobs on its own pooled connection: progress is
+        reported from inside ingest_csv, whose session must not be committed by it
+        """
+        with self._lock:
+            values = {
+                'id': self.id, 'filename': self.filename, 'path': self.path, 'username': self.username,
+                'owner': self.owner, 'status': self.status, 'stage': self.stage, 'message': self.message,
+                'rows_processed': self.rows_processed, 'total_rows': self.total_rows,
+                'created_at': self.created_at, 'started_at': self.started_at, 'finished_at': self.finished_at
+            }
+            self._persisted_at = time.monotonic()
+        try:
+            with self._engine.begin() as conn:
+                if insert:
+                    conn.execute(text("""
+                        INSERT INTO upload_jobs (id, filename, path, username, owner, status, stage, message,
+                                                 rows_processed, total_rows, created_at, started_at, finished_at)
+                        VALUES (:id, :filename, :path, :username, :owner, :status, :stage, :message,
+                                :rows_processed, :total_rows, :created_at, :started_at, :finished_at)
+                    """), values)
+                else:
+                    conn.execute(text("""
+                        UPDATE upload_jobs
+                        SET status = :status, stage = :stage, message = :message, rows_processed = :rows_processed,
+                            total_rows = :total_rows, started_at = :started_at, finished_at = :finished_at
+                        WHERE id = :id
+                    """), values)
+        except Exception as e:
+            print(f"⚠ Could not save state of ingestion job {self.id}: {e}")
+
+    @property
+    def finished(self):
+        return self.status in (JOB_COMPLETED, JOB_FAILED)
+
+    def as_dict(self):
+        with self._lock:
+            end = self.finished_at or datetime.utcnow()
+            elapsed = (end - self.started_at).total_seconds() if self.started_at else 0.0
+            rows_per_sec = self.rows_processed / elapsed if elapsed > 0 else 0.0
+
+            if self.status == JOB_COMPLETED:
+                progress = 100
+            elif self.total_rows:
+                # Row copy is the bulk of the work; hierarchy sync fills the last 5%
+                progress = min(95, int(self.rows_processed * 95 / self.total_rows))
+            else:
+                progress = 0
+
+            eta = None
+            if self.status == JOB_RUNNING and self.total_rows and rows_per_sec > 0:
+                eta = round(max(self.total_rows - self.rows_processed, 0) / rows_per_sec, 1)
+
+            return {
+                'ingestion_id': self.id,
+                'filename': self.filename,
+                'status': self.status,
+                'current_step': self.stage,
+                'progress': progress,
+                'message': self.message,
+                'rows_processed': self.rows_processed,
+                'total_rows': self.total_rows,
+                'rows_per_sec': round(rows_per_sec),
+                'elapsed_seconds': round(elapsed, 1),
+                'eta_seconds': eta
+            }
+
+
+class IngestionJobService:
+    """
+    Runs ingestion jobs on a small in-process worker pool (INGEST_WORKERS threads).
+    Progress of jobs started by other web processes is read from upload_jobs.
+    """
+
+    def __init__(self, ingestion_manager, max_workers=None):
+        self.ingestion_manager = ingestion_manager
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.INGEST_WORKERS,
+            thread_name_prefix='ingest-job'
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, app, path, filename, username, date_range=None, content_hash=None):
+        """Queue an ingestion of a saved upload; the worker removes the file when done"""
+        job = IngestionJob(filename, path, username)
+        job.owner = _hold_owner_lock()
+        job._engine = db.engine
+        job.persist(insert=True)
+        with self._lock:
+            self._prune_finished()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, app, job, date_range, content_hash)
+        return job
+
+    def get(self, job_id):
+        """This process's job, else a snapshot of the job's upload_jobs row, else None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        from app.models import UploadJob
+        try:
+            record = db.session.get(UploadJob, job_id)
+            return IngestionJob.from_record(record) if record else None
+        finally:
+            db.session.rollback()
+
+    def progress(self, job_id):
+        """Progress dict for the upload progress endpoint, or None for an unknown id"""
+        job = self.get(job_id)
+        return job.as_dict() if job else None
+
+    def _run(self, app, job, date_range, content_hash):
+        with app.app_context():
+            job.start()
+            try:
+                # Another process treats jobs of an unlocked owner as interrupted and fails them
+                if not _owner_lock_held(job.owner):
+                    raise OwnerLockLostError(
+                        "this server lost its job lock (database connection dropped); please upload it again"
+                    )
+                load = self.ingestion_manager.ingest_csv(
+                    job.path, job.filename, date_range, progress=job.update, content_hash=content_hash,
+                    uploaded_by=job.username
+                )
+                message = f'✅ File "{job.filename}" uploaded and ingested.'
+                if load['overlapping_files']:
+                    message += (f' ⚠️ Its dates overlap {", ".join(load["overlapping_files"])}; '
+                                f'{load["skipped"]:,} rows already loaded were skipped.')
+                job.finish(True, message)
+                self._log_activity(job.username, f"ingested file '{job.filename}'")
+            except DuplicateUploadError as e:
+                job.finish(False, f'⚠️ {str(e)}')
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Ingestion job {job.id} failed: {e}")
+                job.finish(False, f'❌ Failed to ingest file "{job.filename}": {str(e)}')
+            finally:
+                if os.path.exists(job.path):
+                    os.remove(job.path)
+                db.session.remove()
+
+    def _prune_finished(self):
+        finished = [job for job in self._jobs.values() if job.finished]
+        if len(finished) > FINISHED_JOB_LIMIT:
+            finished.sort(key=lambda job: job.finished_at)
+            for job in finished[:len(finished) - FINISHED_JOB_LIMIT]:
+                del self._jobs[job.id]
+
+    def _log_activity(self, username, message):
+        """Log activity"""
+        from app.models import ActivityLog
+        try:
+            db.session.add(ActivityLog(user=username, msg=message, date=datetime.utcnow()))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+
+# -------------------- Restart Recovery --------------------
+def _hold_owner_lock():
+    """
+    This process's owner token, taking its lock on first use in the process. If the
+    connection holding the lock dropped, the old token is abandoned (its jobs fail before
+    they start) and a new token is locked.
+    """
+    with _owner_lock_guard:
+        if _owner['pid'] == os.getpid() and not _owner_lock_alive():
+            print(f"❌ Lost the ingestion job owner lock {_owner['token']}; queued jobs under it will fail")
+            _drop_owner()
+        if _owner['pid'] != os.getpid():
+            token = uuid.uuid4().hex
+            conn = db.engine.raw_connection()
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_lock(%s, hashtext(%s))", (JOB_OWNER_LOCK_NAMESPACE, token))
+            conn.commit()
+            _owner.update(pid=os.getpid(), token=token, connection=conn)
+        return _owner['token']
+
+
+def _owner_lock_held(token):
+    """True if `token` is this process's owner token and its lock is still held"""
+    with _owner_lock_guard:
+        if _owner['pid'] != os.getpid() or _owner['token'] != token:
+            return False
+        if _owner_lock_alive():
+            return True
+        print(f"❌ Lost the ingestion job owner lock {token}")
+        _drop_owner()
+        return False
+
+
+def _owner_lock_alive():
+    """Ask the owner connection whether it still holds the lock (False if it is gone)"""
+    conn = _owner['connection']
+    try:
+        with conn.cursor() as cursor:
+            # A two-key advisory lock shows up as classid = key1, objid = key2, objsubid = 2
+            cursor.execute("""
+                SELECT EXISTS (
+                    SELECT 1 FROM pg_locks
+                    WHERE locktype = 'advisory' AND pid = pg_backend_pid() AND granted
+                      AND classid = %s AND objid = (hashtext(%s)::bigint & 4294967295)::oid AND objsubid = 2
+                )
+            """, (JOB_OWNER_LOCK_NAMESPACE, _owner['token']))
+            held = cursor.fetchone()[0]
+        conn.commit()
+        return held
+    except Exception as e:
+        print(f"⚠ Ingestion job owner connection is gone: {e}")
+        return False
+
+
+def _drop_owner():
+    """Forget the owner token; its connection is discarded, not returned to the pool"""
+    try:
+        _owner['connection'].invalidate()
+    except Exception:
+        pass
+    _owner.update(pid=None, token=None, connection=None)
+
+
+def recover_interrupted_jobs():
+    """
+    Mark queued/running jobs whose process is gone (its owner lock is free) as failed and
+    remove their temp files; then remove temp uploads no live job refers to and prune old
+    finished jobs. Safe to run from every process at startup.
+    """
+    from app.models import UploadJob
+
+    conn = db.engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT DISTINCT owner FROM upload_jobs WHERE status IN (%s, %s)", (JOB_QUEUED, JOB_RUNNING))
+            owners = [row[0] for row in cursor.fetchall()]
+            dead = []
+            for owner in owners:
+                cursor.execute("SELECT pg_try_advisory_lock(%s, hashtext(%s))", (JOB_OWNER_LOCK_NAMESPACE, owner))
+                if cursor.fetchone()[0]:
+                    dead.append(owner)
+                    cursor.execute("SELECT pg_advisory_unlock(%s, hashtext(%s))", (JOB_OWNER_LOCK_NAMESPACE, owner))
+        conn.commit()
+    finally:
+        conn.close()
+
+    try:
+        if dead:
+            interrupted = UploadJob.query.filter(
+                UploadJob.owner.in_(dead), UploadJob.status.in_((JOB_QUEUED, JOB_RUNNING))
+            ).all()
+            for job in interrupted:
+                job.status = JOB_FAILED
+                job.stage = 'Failed'
+                job.message = f'❌ Ingestion of "{job.filename}" was interrupted by a server restart; please upload it again.'
+                job.finished_at = datetime.utcnow()
+                if job.path and os.path.exists(job.path):
+                    os.remove(job.path)
+            if interrupted:
+                print(f"⚠ {len(interrupted)} ingestion job(s) interrupted by a restart marked failed")
+
+        UploadJob.query.filter(
+            UploadJob.finished_at < datetime.utcnow() - timedelta(days=FINISHED_JOB_RETENTION_DAYS)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠ Could not recover interrupted ingestion jobs: {e}")
+        return
+
+    _remove_orphaned_uploads()
+
+
+def _remove_orphaned_uploads():
+    """Temp uploads older than UPLOAD_ORPHAN_MINUTES that no queued/running job refers to"""
+    from app.models import UploadJob
+
+    if not os.path.isdir(Config.UPLOAD_TEMP_DIR):
+        return
+    active = {
+        os.path.abspath(row[0]) for row in
+        db.session.query(UploadJob.path).filter(UploadJob.status.in_((JOB_QUEUED, JOB_RUNNING))).all() if row[0]
+    }
+    db.session.rollback()
+    cutoff = time.time() - Config.UPLOAD_ORPHAN_MINUTES * 60
+    removed = 0
+    for name in os.listdir(Config.UPLOAD_TEMP_DIR):
+        path = os.path.join(Config.UPLOAD_TEMP_DIR, name)
+        try:
+            if os.path.isfile(path) and os.path.abspath(path) not in active and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    if removed:
+        print(f"🧹 Removed {removed} orphaned upload file(s) from {Config.UPLOAD_TEMP_DIR}")
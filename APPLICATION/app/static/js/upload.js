@@ -34,27 +34,21 @@ function initializeUpload() {
         uploadBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Processing...';
         uploadBtn.disabled = true;
         
-        // Simulate progress updates
-        let progress = 0;
-        const progressInterval = setInterval(() => {
-            if (progress < 95) {
-                progress += 5;
-                window.notifier.updateProgress(toastId, progress);
-                
-                const messages = [
-                    'Loading CSV with memory mapping...',
-                    'Minimal data processing...',
-                    'Fetching previous records...',
-                    'Inserting into database...',
-                    'Finalizing ingestion...'
-                ];
-                
-                const messageIndex = Math.floor(progress / 20);
-                if (messageIndex < messages.length) {
-                    window.notifier.updateToast(toastId, messages[messageIndex]);
-                }
-            }
-        }, 500);
+        const finishUpload = () => {
+            uploadBtn.innerHTML = originalText;
+            uploadBtn.disabled = false;
+            fileInput.value = '';
+        };
+        
+        const markFailed = (title, message) => {
+            window.notifier.updateProgress(toastId, 100);
+            window.notifier.updateToast(toastId, title, `❌ ${message}`);
+            document.getElementById(toastId).classList.add('error');
+            showAlert(message, 'error');
+            finishUpload();
+        };
+        
+        window.notifier.updateToast(toastId, 'Uploading file...');
         
         fetch(uploadForm.action, {
             method: 'POST',
@@ -70,52 +64,69 @@ function initializeUpload() {
             return response.json();
         })
         .then(data => {
-            clearInterval(progressInterval);
-            window.notifier.updateProgress(toastId, 100);
-            
-            // Debug logging
-            console.log('Upload response:', data);
-            console.log('Success flag:', data.success);
-            console.log('Message:', data.message);
+            if (!data.success || !data.ingestion_id) {
+                markFailed('Ingestion Failed', data.message || 'Failed to process file');
+                return;
+            }
             
-            // Handle response format - check for success flag or message content
-            const isSuccess = data.success === true || (data.message && data.message.includes('✅'));
+            window.notifier.updateToast(toastId, data.message);
+            pollIngestionProgress(data.ingestion_id, toastId, filename, finishUpload, markFailed);
+        })
+        .catch(error => {
+            markFailed('Upload Error', error.message || 'Failed to upload file. Please try again.');
+        });
+    });
+}
+
+// Poll the background ingestion job until it completes or fails
+function pollIngestionProgress(ingestionId, toastId, filename, onDone, onFailed) {
+    const poll = () => {
+        fetch(`/upload/progress/${ingestionId}`, {
+            headers: { 'X-Requested-With': 'XMLHttpRequest' }
+        })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            window.notifier.updateProgress(toastId, data.progress);
             
-            if (isSuccess) {
+            if (data.status === 'completed') {
                 window.notifier.updateToast(
-                    toastId, 
-                    'Ingestion Complete!', 
-                    `✅ ${data.message || `Processed ${filename} successfully`}`
+                    toastId,
+                    'Ingestion Complete!',
+                    `${data.message} (${(data.total_rows ?? 0).toLocaleString()} rows in ${data.elapsed_seconds}s)`
                 );
                 document.getElementById(toastId).classList.add('success');
-                showAlert(data.message || 'File processed successfully!', 'success');
-            } else {
-                window.notifier.updateToast(
-                    toastId, 
-                    'Ingestion Failed', 
-                    `❌ ${data.message || 'Failed to process file'}`
-                );
-                document.getElementById(toastId).classList.add('error');
-                showAlert(data.message || 'Failed to process file', 'error');
+                showAlert(data.message || `Processed ${filename} successfully`, 'success');
+                onDone();
+                return;
+            }
+            
+            if (data.status === 'failed') {
+                onFailed('Ingestion Failed', data.message || 'Failed to process file');
+                return;
             }
+            
+            let detail = data.current_step;
+            if (data.total_rows) {
+                detail += ` — ${(data.rows_processed ?? 0).toLocaleString()} / ${(data.total_rows ?? 0).toLocaleString()} rows`;
+            }
+            if (data.rows_per_sec) {
+                detail += ` (${data.rows_per_sec.toLocaleString()} rows/s`;
+                detail += data.eta_seconds !== null ? `, ~${Math.ceil(data.eta_seconds)}s left)` : ')';
+            }
+            window.notifier.updateToast(toastId, detail);
+            setTimeout(poll, 1000);
         })
         .catch(error => {
-            clearInterval(progressInterval);
-            window.notifier.updateProgress(toastId, 100);
-            window.notifier.updateToast(
-                toastId, 
-                'Upload Error', 
-                `❌ ${error.message || 'Failed to process file'}`
-            );
-            document.getElementById(toastId).classList.add('error');
-            showAlert('Failed to upload file. Please try again.', 'error');
-        })
-        .finally(() => {
-            uploadBtn.innerHTML = originalText;
-            uploadBtn.disabled = false;
-            fileInput.value = '';
+            onFailed('Progress Error', error.message || 'Lost track of the ingestion job');
         });
-    });
+    };
+    
+    poll();
 }
 
 function initializeFileManagement() {
@@ -2,6 +2,7 @@ import pandas as pd
 from datetime import datetime
 from app import db
 from app.models import UpdatedCallLog, Agent, TeamManager, TeamLeader, ActivityLog
+from app.utils import clean_agent_name
 
 
 def update_agent_data(agent_name, designation=None, role=None, from_date=None, group_name=None,
@@ -12,6 +13,8 @@ def update_agent_data(agent_name, designation=None, role=None, from_date=None, g
     Also ensures TeamLeader table is updated when TM/group are assigned AFTER TL creation.
     Additionally logs all updates to ActivityLog.
     """
+    # Match the stored form of the name (e.g. 'john doe-P' -> 'John Doe')
+    agent_name = clean_agent_name(agent_name)[0] or agent_name
     from_date_dt = pd.to_datetime(from_date, errors="coerce") if from_date else None
 
     # === 1) Get all affected UpdatedCallLog records ===
@@ -4,6 +4,10 @@ See DOCUMENTATION.txt for detailed function descriptions.
 """
 
 import re
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
 from werkzeug.security import generate_password_hash
 from app.models import ActivityLog, DeleteRequest, db
 from datetime import datetime
@@ -20,6 +24,78 @@ def normalize_name(name):
     return name.strip().title() if name else ""
 
 
+# Agent-name cleaning rules, compiled once
+PARENTHESIZED_TEXT = re.compile(r"\(.*?\)")
+PART_TIMER_SUFFIX = re.compile(r"(?:-P|_P|\sP)$", re.IGNORECASE)
+TRAILING_SEPARATORS = re.compile(r"[-_\s]+$")
+AGENT_NAME_MEMO_SIZE = 10000
+
+
+class AgentNameNormalizer:
+    """
+    Cleans columns of raw agent names (see clean_agent_name for the rules).
+    Each distinct name is cleaned once with vectorized string ops, and results are
+    kept in a bounded LRU memo shared across uploads, so known names cost a lookup.
+    """
+
+    def __init__(self, maxsize=AGENT_NAME_MEMO_SIZE):
+        self.maxsize = maxsize
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def normalize(self, names):
+        """(names, roles) object arrays aligned to `names` (list, array, Series or Categorical); NA -> ''"""
+        codes, uniques = pd.factorize(pd.Series(names), use_na_sentinel=False)
+        keys = ['' if pd.isna(value) else str(value) for value in uniques]
+
+        resolved = self._resolve(keys)
+        clean_names = np.array([name for name, _ in resolved], dtype=object)
+        roles = np.array([role for _, role in resolved], dtype=object)
+        return clean_names[codes], roles[codes]
+
+    def _resolve(self, keys):
+        results = [None] * len(keys)
+        misses = {}
+        with self._lock:
+            for position, key in enumerate(keys):
+                hit = self._memo.get(key)
+                if hit is None:
+                    misses.setdefault(key, []).append(position)
+                else:
+                    self._memo.move_to_end(key)
+                    results[position] = hit
+
+        if misses:
+            cleaned = self._clean(list(misses))
+            with self._lock:
+                for key, value in zip(misses, cleaned):
+                    for position in misses[key]:
+                        results[position] = value
+                    self._memo[key] = value
+                    self._memo.move_to_end(key)
+                while len(self._memo) > self.maxsize:
+                    self._memo.popitem(last=False)
+        return results
+
+    def _clean(self, raw_names):
+        """Apply the cleaning rules to distinct raw names at once; returns [(name, role), ...]"""
+        names = pd.Series(raw_names, dtype=object).str.strip()
+        names = names.str.replace(PARENTHESIZED_TEXT, "", regex=True).str.strip()
+        part_timer = names.str.contains(PART_TIMER_SUFFIX).to_numpy(dtype=bool)
+        names = names.str.replace(PART_TIMER_SUFFIX, "", regex=True)
+        names = names.str.replace(TRAILING_SEPARATORS, "", regex=True).str.strip().str.title()
+        roles = np.where(part_timer, "Part-Timer", "Full-Timer")
+        return list(zip(names.tolist(), roles.tolist()))
+
+
+agent_name_normalizer = AgentNameNormalizer()
+
+
+def normalize_agent_names(names):
+    """Vectorized clean_agent_name: (names, roles) arrays aligned to the input"""
+    return agent_name_normalizer.normalize(names)
+
+
 def clean_agent_name(raw_name: str):
     """
     Clean agent names by removing:
@@ -41,31 +117,13 @@ def clean_agent_name(raw_name: str):
     if not raw_name:
         return "", "Full-Timer"
 
-    name = str(raw_name).strip()
-
-    # Remove anything inside parentheses e.g. (deleted), (temp)
-    name = re.sub(r"\(.*?\)", "", name, flags=re.IGNORECASE).strip()
-
-    role = "Full-Timer"
-
-    # Detect part-timer markers (-P, _P, or ' P' at end)
-    if re.search(r"(-P|_P|\sP)$", name, re.IGNORECASE):
-        role = "Part-Timer"
-        # Remove those markers
-        name = re.sub(r"(-P|_P|\sP)$", "", name, flags=re.IGNORECASE)
-
-    # Cleanup: remove trailing underscores, hyphens, spaces
-    name = re.sub(r"[-_\s]+$", "", name).strip()
-
-    # Normalize case (title case)
-    name = name.title()
-
-    return name, role
+    names, roles = normalize_agent_names([raw_name])
+    return names[0], roles[0]
 
 
 def detect_role(name):
-    """Detect if agent is part-time or full-time based on '-P' marker"""
-    return "Part-Timer" if name and "-P" in name else "Full-Timer"
+    """Detect if agent is part-time or full-time from the name's part-timer marker"""
+    return clean_agent_name(name)[1]
 
 
 def log_activity(user, message):
@@ -0,0 +1,85 @@
+"""
+COPY format benchmark: CSV text vs PostgreSQL binary for updated_call_logs rows.
+Encodes a synthetic frame both ways and COPYs it into updated_call_logs_staging
+inside a transaction that is rolled back, then prints rows/sec for each path.
+
+Usage: python benchmark_copy.py [rows]
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from app import create_app, db
+from app.data_ingestion import DataIngestionManager, CopyStream, UPDATED_COPY_COLUMNS, COPY_READ_SIZE
+
+
+def build_frame(rows):
+    """Synthetic updated_call_logs rows in COPY column order"""
+    ids = np.arange(rows)
+    agents = pd.Series(ids % 500).map(lambda n: f"Agent {n}")
+    return pd.DataFrame({
+        'agent_name': agents.to_numpy(),
+        'profile_id': (ids % 2000).astype(str),
+        'call_log_id': [f"CL{n}" for n in ids],
+        'log_time': (np.datetime64('2024-01-01T00:00:00', 'ns') + ids * np.timedelta64(7, 's')),
+        'log_type': np.where(ids % 3 == 0, 'Call', 'Wrap'),
+        'state': 'Ready',
+        'call_type': 'Outbound',
+        'original_campaign': (ids % 7).astype(str),
+        'current_campaign': (ids % 7).astype(str),
+        'ember': np.where(ids % 5 == 0, None, 'E1'),
+        'designation': 'Cold Caller',
+        'role': 'Full-Timer',
+        'group_name': np.where(ids % 4 == 0, '', 'Group A'),
+        'tm_name': 'Manager',
+        'tl_name': 'Leader',
+        'source_file': 'benchmark.csv',
+        'status': 'Employee',
+    })
+
+
+def run(rows):
+    frame = build_frame(rows)
+    manager = DataIngestionManager()
+    results = []
+
+    for copy_format in ('csv', 'binary'):
+        manager._copy_format_name = copy_format
+
+        started = time.perf_counter()
+        pieces = list(manager._iter_copy_pieces(frame))
+        encode_seconds = time.perf_counter() - started
+        payload_mb = sum(len(piece) for piece in pieces) / (1024 * 1024)
+
+        raw_conn = db.engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cursor:
+                started = time.perf_counter()
+                cursor.copy_expert(
+                    f"COPY updated_call_logs_staging ({UPDATED_COPY_COLUMNS}) "
+                    f"FROM STDIN WITH (FORMAT {copy_format.upper()})",
+                    CopyStream(pieces), size=COPY_READ_SIZE
+                )
+                copy_seconds = time.perf_counter() - started
+        finally:
+            raw_conn.rollback()
+            raw_conn.close()
+
+        results.append((copy_format, encode_seconds, copy_seconds, payload_mb))
+
+    print(f"\n📊 COPY format benchmark ({rows:,} updated_call_logs rows)")
+    print(f"{'format':<8}{'encode rows/s':>16}{'COPY rows/s':>16}{'total rows/s':>16}{'payload MB':>12}")
+    for copy_format, encode_seconds, copy_seconds, payload_mb in results:
+        print(f"{copy_format:<8}{rows / encode_seconds:>16,.0f}{rows / copy_seconds:>16,.0f}"
+              f"{rows / (encode_seconds + copy_seconds):>16,.0f}{payload_mb:>12.1f}")
+
+    csv_total = results[0][1] + results[0][2]
+    binary_total = results[1][1] + results[1][2]
+    print(f"Binary vs CSV end-to-end: {csv_total / binary_total:.2f}x")
+
+
+if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,33 @@
+import io
+import pandas as pd
+from app.loader import strip_values, iter_csv_frames, clean_frame, REQUIRED_COLUMNS
+
+
+def test_strip_values_all_na_categorical():
+    column = pd.Series([None, None, None], dtype='category')
+    stripped = strip_values(column)
+    assert len(stripped) == 3
+    assert pd.isna(stripped).all()
+
+
+def test_strip_values_categorical_keeps_na_and_merges_categories():
+    column = pd.Series([' A', 'A ', None, 'B'], dtype='category')
+    stripped = strip_values(column)
+    assert list(stripped.categories) == ['A', 'B']
+    assert pd.isna(stripped[2])
+    assert list(stripped[[0, 1, 3]]) == ['A', 'A', 'B']
+
+
+def test_blank_ember_column_is_read_and_cleaned():
+    csv = (
+        ','.join(REQUIRED_COLUMNS) + '\n'
+        + 'Alice,P1,CL1,2024-05-01 10:00:00,Call,Ready,Outbound,C1,C1,\n'
+        + 'Bob,P2,CL2,2024-05-01 10:05:00,Wrap,Ready,Outbound,C1,C1,\n'
+    ).encode()
+    frames = [
+        clean_frame(frame)
+        for frame in iter_csv_frames(io.BytesIO(csv), REQUIRED_COLUMNS, chunk_rows=1, block_bytes=1024, engine='c')
+    ]
+    assert [len(frame) for frame in frames] == [1, 1]
+    assert all(frame['Ember'].isna().all() for frame in frames)
+    assert (frames[0]['Ember'].astype(object) != 'nan').all()